@@ -0,0 +1,126 @@
+import os
+import sys
+import csv
+import argparse
+from timeit import default_timer as timer
+
+data_scanner_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(data_scanner_path)
+
+import pendulum
+
+from data_scanner.scanner import CSVScanner
+
+SAMPLE_VALUES = [
+    "",
+    "NULL",
+    "1234",
+    "-1234",
+    "1234.5678",
+    "1.5e10",
+    "True",
+    "f",
+    "2022-11-03",
+    "2022-11-03T01:41:51",
+    '{"b": 2, "c": 3}',
+    "[1, 2, 3]",
+    "Lorem ipsum dolor sit amet",
+    "qYzxkBah",
+]
+
+
+def legacy_classify(scanner, value, nulls, booleans):
+    """Type of first non-null value, as found before the single-pass classifier."""
+    if value in nulls:
+        return "unknown"
+    if scanner._re_pattern_float.match(value):
+        if scanner._re_pattern_int.match(value):
+            return "integer"
+        return "float"
+    date_type = legacy_is_date_or_timestamp(value)
+    if date_type:
+        return date_type
+    if scanner._is_json(value):
+        return "json"
+    if value in booleans:
+        return "boolean"
+    return "string"
+
+
+def legacy_is_date_or_timestamp(value):
+    try:
+        parsed = pendulum.parse(value)
+        if (
+            parsed.hour != 0
+            or parsed.minute != 0
+            or parsed.second != 0
+            or parsed.microsecond != 0
+        ):
+            return "timestamp"
+        return "date"
+    except:
+        return False
+
+
+def load_values(file_path, limit):
+    values = []
+    with open(file_path, "rt") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            values.extend(row)
+            if len(values) >= limit:
+                break
+    return values[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark single-pass classifier against the chained checks."
+    )
+    parser.add_argument(
+        "--values", "-n", action="store", type=int, default=100_000, dest="values"
+    )
+    args = parser.parse_args()
+
+    script_path = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(script_path, "data", "csv")
+
+    if os.path.isdir(data_path) and os.listdir(data_path):
+        file_path = os.path.join(data_path, sorted(os.listdir(data_path))[0])
+        print(f"[INFO] Using values from {file_path}")
+        values = load_values(file_path, args.values)
+    else:
+        print("[INFO] No generated data found, using sample values")
+        values = (SAMPLE_VALUES * (args.values // len(SAMPLE_VALUES) + 1))[
+            : args.values
+        ]
+
+    scanner = CSVScanner(iter(()))
+    nulls = list(scanner._nulls)
+    booleans = list(scanner._booleans)
+
+    for value in set(values):
+        assert scanner._classify(value) == legacy_classify(
+            scanner, value, nulls, booleans
+        ), f"Classifiers disagree on {value!r}"
+
+    start = timer()
+    for value in values:
+        legacy_classify(scanner, value, nulls, booleans)
+    end = timer()
+    print(
+        f"[INFO] Chained checks took ~{round(end - start, 5)}s for {len(values)} values"
+    )
+
+    start = timer()
+    for value in values:
+        scanner._classify(value)
+    end = timer()
+    print(
+        f"[INFO] Single-pass classifier took ~{round(end - start, 5)}s for {len(values)} values"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import logging
+import argparse
+import tempfile
+from timeit import default_timer as timer
+
+data_scanner_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(data_scanner_path)
+
+from data_scanner import setLoggingLevel
+from tests.test_differential import generate_files, get_runs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare all the engines and run modes of data scanner on random files."
+    )
+    parser.add_argument(
+        "--type",
+        "-t",
+        action="store",
+        default="all",
+        choices=["all", "csv", "json"],
+        dest="type",
+    )
+    parser.add_argument("--files", action="store", type=int, default=4, dest="files")
+    parser.add_argument(
+        "--size",
+        action="store",
+        type=int,
+        default=50000,
+        dest="size",
+        help="rows (or records) per file",
+    )
+    args = parser.parse_args()
+
+    if args.type == "all":
+        types = ["csv", "json"]
+    else:
+        types = [args.type]
+
+    setLoggingLevel(logging.WARNING)
+
+    for type_ in types:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(f"[INFO] Generating {args.files} {type_} files...")
+            expected = generate_files(type_, tmp_dir, args.files, args.size)
+
+            runs = get_runs(type_, tmp_dir, block_size=1024 * 1024)
+            for name, run in runs.items():
+                start = timer()
+                output = run()
+                end = timer()
+                print(
+                    f"[INFO] {type_} {name:<20} ~{round(end - start, 3)}s"
+                    + ("" if output == expected else " (schemas differ!)")
+                )
+
+
+if __name__ == "__main__":
+    main()
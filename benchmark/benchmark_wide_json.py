@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import tracemalloc
+from timeit import default_timer as timer
+
+data_scanner_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(data_scanner_path)
+
+from data_scanner import Processor
+from data_scanner.loader import JSONLoader
+from data_scanner.scanner import JSONScanner
+
+
+def generate_wide_json(file_path, seed, n_records, n_keys, keys_per_record):
+    """Write records with a few keys each out of many, every third one an object."""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(n_records):
+        record = {}
+        for idx in rng.sample(range(n_keys), keys_per_record):
+            if idx % 3 == 0:
+                record[f"key_{idx}"] = {"a": idx, "b": "x", "c": [idx]}
+            else:
+                record[f"key_{idx}"] = [idx, "x", 1.5, None, True][idx % 5]
+        records.append(record)
+    with open(file_path, "wt") as f:
+        json.dump(records, f)
+
+
+def interned_schema(file_path, sep="_"):
+    """Schema of a file with key paths interned by column id, instead of flattened names.
+
+    Keys of every object map to column ids of values or to entries
+    ([name, keys]) of objects nested under them, so flattened names
+    are only built once, and types are kept in a list by column id.
+    """
+    names, ids, types = [], {}, []
+    root = ["", {}]
+
+    def get_id(parent, key):
+        name = parent[0] + sep + key if parent[0] else key
+        column_id = ids.get(name)
+        if column_id is None:
+            column_id = ids[name] = len(names)
+            names.append(name)
+            types.append("unknown")
+        if key not in parent[1]:
+            parent[1][key] = column_id
+        return column_id
+
+    def get_object(parent, key):
+        name = parent[0] + sep + key if parent[0] else key
+        if key in parent[1]:
+            return [name, {}]
+        entry = parent[1][key] = [name, {}]
+        return entry
+
+    def _recurse(record, parent, get_dtype):
+        keys = parent[1]
+        for key, value in record.items():
+            found = keys.get(key)
+            if isinstance(value, dict):
+                if type(found) is not list:
+                    found = get_object(parent, key)
+                _recurse(value, found, get_dtype)
+                continue
+            if type(found) is not int:
+                found = get_id(parent, key)
+            types[found] = get_dtype(value, types[found])
+
+    with JSONLoader(file_path) as reader:
+        get_dtype = JSONScanner(reader)._get_dtype
+        for record in reader.json_file:
+            _recurse(record, root, get_dtype)
+
+    return dict(zip(names, types))
+
+
+def measure(run, repeat):
+    """Get the best time of a few runs, and peak memory of a traced one (tracing slows it down)."""
+    elapsed = []
+    for _ in range(repeat):
+        start = timer()
+        output = run()
+        elapsed.append(timer() - start)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return output, min(elapsed), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark scans of very wide JSON files against interned key paths."
+    )
+    parser.add_argument(
+        "--records", action="store", type=int, default=3000, dest="records"
+    )
+    parser.add_argument("--keys", action="store", type=int, default=50000, dest="keys")
+    parser.add_argument(
+        "--keys-per-record",
+        action="store",
+        type=int,
+        default=170,
+        dest="keys_per_record",
+    )
+    parser.add_argument("--repeat", action="store", type=int, default=5, dest="repeat")
+    args = parser.parse_args()
+
+    runs = dict(
+        python=lambda path: Processor(path, "json").run()[0],
+        streaming=lambda path: Processor(path, "json", engine="streaming").run()[0],
+        interned=interned_schema,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "wide.json")
+        print(
+            f"[INFO] Generating {args.records} records with {args.keys_per_record} "
+            f"out of {args.keys} keys..."
+        )
+        generate_wide_json(file_path, 0, args.records, args.keys, args.keys_per_record)
+
+        expected = None
+        for name, run in runs.items():
+            output, elapsed, peak = measure(lambda: run(file_path), args.repeat)
+            if expected is None:
+                expected = output
+            print(
+                f"[INFO] {name:<10} ~{round(elapsed, 3)}s, "
+                f"peak memory ~{round(peak / 1024 / 1024, 1)}MB "
+                f"for {len(output)} columns"
+                + ("" if output == expected else " (schemas differ!)")
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,12 @@
-from .processor import Processor
 from .logger import setLoggingLevel
+
+__all__ = ["Processor", "setLoggingLevel"]
+
+
+def __getattr__(name: str) -> type:
+    # Processor pulls in all the scanners, it's imported on first use
+    if name == "Processor":
+        from .processor import Processor
+
+        return Processor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
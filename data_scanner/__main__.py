@@ -0,0 +1,215 @@
+import sys
+import json
+import argparse
+from typing import List, Union
+
+_RUN_MODES = ("auto", "sequential", "processes", "threads", "chunks")
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m data_scanner",
+        description="Scan CSV or JSON files and print their schemas.",
+    )
+    parser.add_argument("paths", nargs="+", help="files or directories to scan")
+    parser.add_argument(
+        "-t", "--type", required=True, choices=("csv", "json"), dest="type_"
+    )
+    parser.add_argument(
+        "-e", "--engine", default="python", choices=("python", "arrow", "streaming")
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        default="auto",
+        choices=_RUN_MODES,
+        help="how files are scanned (default: picked from file sizes)",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument(
+        "--memory-limit",
+        type=int,
+        default=None,
+        help="resident memory (in MB) worker processes can use in total",
+    )
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        default=None,
+        help="seconds a worker process can spend scanning a single file",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=2,
+        help="times a file is scanned again after its worker process was lost",
+    )
+    parser.add_argument(
+        "--quarantine",
+        default=None,
+        help="file listing files that could not be scanned, to skip them later",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="file to keep results in as files are done, to resume the scan later",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip files done by a previous scan, kept in --checkpoint",
+    )
+    parser.add_argument(
+        "-n",
+        "--negotiate",
+        action="store_true",
+        help="print a single schema negotiated between all the files",
+    )
+    parser.add_argument(
+        "-g",
+        "--group-by",
+        default=None,
+        help=(
+            "negotiate schemas within groups of files, found in their paths "
+            "with a regex or a number of leading partition directories (key=value)"
+        ),
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="scan directories recursively"
+    )
+    parser.add_argument(
+        "-c",
+        "--columns",
+        default=None,
+        help=(
+            "comma separated columns to scan, CSV column names or (0-based) "
+            "indexes, JSON key path prefixes"
+        ),
+    )
+    parser.add_argument(
+        "--outlier-threshold",
+        type=float,
+        default=None,
+        help="fraction of values that don't fit a type tolerated in a column",
+    )
+    parser.add_argument(
+        "--encoding",
+        default=None,
+        help="encoding of CSV files (default: detected from their beginning)",
+    )
+    parser.add_argument(
+        "--encoding-errors",
+        default="strict",
+        help=(
+            "how bytes that can't be decoded are handled: strict, replace, "
+            "ignore or fallback (decoded as windows-1252)"
+        ),
+    )
+    parser.add_argument("--no-header", action="store_false", dest="header")
+    parser.add_argument("--sniff-dialect", action="store_true")
+    parser.add_argument(
+        "--max-malformed-rows",
+        type=int,
+        default=0,
+        help="negative value for no limit",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        default="json",
+        choices=("json", "text"),
+        help="output format",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def format_schemas(schemas: Union[dict, list], format: str = "json") -> str:
+    """Format schemas returned by Processor for printing."""
+    if format == "json":
+        return json.dumps(schemas, indent=2)
+    if isinstance(schemas, dict) and "groups" in schemas and "files" in schemas:
+        # Grouped schemas, see Processor
+        return "\n\n".join(
+            f"[{group}]\n" + format_schemas(schema, format)
+            for group, schema in schemas["groups"].items()
+        )
+    if isinstance(schemas, dict):
+        schemas = [schemas]
+    return "\n\n".join(
+        "\n".join(f"{name}: {type_}" for name, type_ in schema.items())
+        for schema in schemas
+    )
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """Run a scan, exit code is 1 if any of the files could not be scanned."""
+    args = get_parser().parse_args(argv)
+
+    # Imported after parsing, so that --help doesn't wait for them
+    import logging
+    from .logger import handler, setLoggingLevel
+    from .processor import Processor
+
+    # Output goes to stdout, logs must not get mixed with it
+    handler.setStream(sys.stderr)
+    setLoggingLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    columns = None
+    if args.columns is not None:
+        columns = [
+            int(column) if args.type_ == "csv" and column.isdigit() else column
+            for column in args.columns.split(",")
+        ]
+
+    processor = Processor(
+        args.paths,
+        args.type_,
+        negotiate_schema=args.negotiate,
+        header=args.header,
+        max_malformed_rows=(
+            args.max_malformed_rows if args.max_malformed_rows >= 0 else None
+        ),
+        sniff_dialect=args.sniff_dialect,
+        engine=args.engine,
+        group_by=(
+            int(args.group_by)
+            if args.group_by is not None and args.group_by.isdigit()
+            else args.group_by
+        ),
+        recursive=args.recursive,
+        outlier_threshold=args.outlier_threshold,
+        columns=columns,
+        memory_limit=(
+            args.memory_limit * 1024 * 1024 if args.memory_limit is not None else None
+        ),
+        quarantine=args.quarantine,
+        checkpoint=args.checkpoint,
+        resume=args.resume,
+        encoding=args.encoding,
+        encoding_errors=args.encoding_errors,
+    )
+    if not processor.file_list:
+        return 1
+
+    if args.mode == "sequential":
+        schemas = processor.run()
+    elif args.mode == "processes":
+        schemas = processor.run_workers(
+            args.workers, args.max_retries, args.task_timeout
+        )
+    elif args.mode == "threads":
+        schemas = processor.run_threads(args.workers)
+    elif args.mode == "chunks":
+        schemas = processor.run_chunks(args.workers)
+    else:
+        schemas = processor.run_auto(args.workers, args.max_retries, args.task_timeout)
+
+    print(format_schemas(schemas, args.format))
+
+    # Metrics are only kept for files scanned successfully
+    return int(len(processor.metrics["files"]) < len(processor.file_list))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+import os
+import csv
+import codecs
+from typing import Dict, List, Union, Iterator, Iterable
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .loader import (
+    Loader,
+    get_errors,
+    is_ascii_compatible,
+    resolve_columns,
+    sniff_dialect,
+    sniff_encoding,
+)
+from .scanner import CSVScanner
+from .state import TYPES, ColumnState, SchemaState
+from .negotiator import DriftDetector
+
+ARROW_TYPES = {
+    "unknown": pa.null(),
+    "integer": pa.int64(),
+    "float": pa.float64(),
+    "boolean": pa.bool_(),
+    "date": pa.date32(),
+    "timestamp": pa.timestamp("us"),
+    "json": pa.string(),
+    "string": pa.string(),
+}
+
+# Files smaller than that are read at once with multithreaded reader,
+# bigger ones are streamed batch by batch to keep memory bounded
+_IN_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# Whole column checks, ascii digits only, since re2 and python
+# disagree on unicode digits (values that fail are checked one by one)
+_RE2_PATTERN_INT = r"^[0-9]+(\.0*)?$"
+_RE2_PATTERN_FLOAT = r"^[+-]?([0-9]+\.[0-9]*|\.[0-9]+|[0-9]+)([eE][+-]?[0-9]+)?$"
+# Plain iso dates and timestamps, pendulum rejects year 0 and leap seconds
+_RE2_YEAR = r"([1-9][0-9]{3}|0[1-9][0-9]{2}|00[1-9][0-9]|000[1-9])"
+_RE2_PATTERN_DATE = "^" + _RE2_YEAR + r"-[0-9]{2}-[0-9]{2}$"
+_RE2_PATTERN_TIMESTAMP = (
+    "^" + _RE2_YEAR + r"-[0-9]{2}-[0-9]{2}[T ][0-9]{2}:[0-9]{2}:[0-5][0-9]$"
+)
+_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S")
+
+
+def to_arrow_schema(schema: Dict[str, str]) -> pa.Schema:
+    """Map a schema found by Processor onto pyarrow schema.
+
+    Original type is kept in field metadata, so json columns
+    can be told apart from strings.
+    """
+    return pa.schema(
+        [
+            pa.field(name, ARROW_TYPES[type_], metadata={"data_scanner_type": type_})
+            for name, type_ in schema.items()
+        ]
+    )
+
+
+def write_schema(
+    schema: Dict[str, str], file_path: Union[str, os.PathLike], format: str = "parquet"
+) -> None:
+    """Write schema as an empty parquet or arrow ipc file."""
+    assert format in ("parquet", "ipc"), "Only parquet or ipc formats are supported"
+
+    arrow_schema = to_arrow_schema(schema)
+    if format == "parquet":
+        pq.write_table(arrow_schema.empty_table(), file_path)
+    else:
+        with pa.OSFile(str(file_path), "wb") as sink:
+            with pa.ipc.new_file(sink, arrow_schema):
+                pass
+
+
+class ArrowCSVLoader(Loader):
+    """Allows to iterate over record batches of a CSV file read by pyarrow.
+
+    All columns are read as non-nullable strings, so values reach the
+    scanner exactly as in the file. Header handling, malformed rows and
+    column selection (see resolve_columns) are dealt with here, since
+    pyarrow parses whole batches at once. Columns that are not selected
+    are never converted.
+
+    Encoding is detected like in CSVLoader. Values are read as strings
+    if they are UTF-8 with strict errors (validated by pyarrow), or
+    UTF-16/32 (transcoded by pyarrow). Otherwise they are read as binary
+    and only decoded by the scanner where they are checked one by one
+    (see value_encoding).
+    """
+
+    def __init__(
+        self,
+        file_path: Union[str, os.PathLike],
+        sniff: bool = False,
+        header: bool = True,
+        max_malformed_rows: Union[int, None] = 0,
+        malformed_sample_size: int = 10,
+        columns: Union[List[Union[str, int]], None] = None,
+        encoding: Union[str, None] = None,
+        errors: str = "strict",
+    ):
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"File not found: '{file_path}'")
+
+        self.file_path = file_path
+        self.sniff = sniff
+        self.encoding = encoding
+        self.errors = get_errors(errors)
+        self.header = header
+        self.max_malformed_rows = max_malformed_rows
+        self.malformed_sample_size = malformed_sample_size
+        self.columns = columns
+        self.metrics = {}
+
+        self.column_names = None
+        # Encoding of binary values in batches, None if they are strings
+        self.value_encoding = None
+        self._reader = None
+
+    def _read_first_row(self, encoding: str, dialect: Dict) -> List[str]:
+        with open(self.file_path, "rt", encoding=encoding, errors=self.errors) as f:
+            try:
+                return next(csv.reader(f, **dialect))
+            except StopIteration:
+                raise ValueError("Failed to read header, empty file")
+
+    def _handle_invalid_row(self, row) -> str:
+        malformed_rows = self.metrics["malformed_rows"] + 1
+        if (
+            self.max_malformed_rows is not None
+            and malformed_rows > self.max_malformed_rows
+        ):
+            return "error"
+        self.metrics["malformed_rows"] = malformed_rows
+        if len(self.metrics["malformed_sample"]) < self.malformed_sample_size:
+            # Line numbers are unknown to pyarrow when values
+            # can contain newlines, row text is kept instead
+            self.metrics["malformed_sample"].append(
+                row.number if row.number is not None else row.text
+            )
+        return "skip"
+
+    def open(self) -> Iterable:
+        encoding, dialect = self.encoding, {}
+        if self.sniff:
+            sniffed_encoding, dialect = sniff_dialect(self.file_path)
+            encoding = encoding or sniffed_encoding
+        elif encoding is None:
+            encoding = sniff_encoding(self.file_path)
+        self.metrics = dict(malformed_rows=0, malformed_sample=[])
+
+        first_row = self._read_first_row(encoding, dialect)
+        if not first_row:
+            raise ValueError("Failed to read header, empty first line")
+        if self.header:
+            self.column_names = first_row
+        else:
+            self.column_names = [
+                f"column_{idx}" for idx in range(1, len(first_row) + 1)
+            ]
+
+        # Arrow needs unique names, actual names are kept in column_names
+        names = [f"f{idx}" for idx in range(len(first_row))]
+        include_columns = None
+        if self.columns is not None:
+            indexes = resolve_columns(self.columns, self.column_names)
+            self.column_names = [self.column_names[idx] for idx in indexes]
+            # Empty list would include all of them, first one is dropped later
+            include_columns = [names[idx] for idx in indexes] or names[:1]
+        codec = codecs.lookup(encoding).name
+        if is_ascii_compatible(encoding) and (
+            codec not in ("utf-8", "utf-8-sig") or self.errors != "strict"
+        ):
+            # Byte order mark is skipped by pyarrow
+            self.value_encoding = "utf-8" if codec == "utf-8-sig" else encoding
+            value_type, encoding = pa.binary(), "utf8"
+        else:
+            self.value_encoding = None
+            value_type, encoding = pa.string(), codec.replace("-sig", "")
+
+        # Header is read as data and dropped from the first batch
+        read_options = pa_csv.ReadOptions(column_names=names, encoding=encoding)
+        parse_options = pa_csv.ParseOptions(
+            delimiter=dialect.get("delimiter", ","),
+            quote_char=dialect.get("quotechar", '"'),
+            newlines_in_values=True,
+            ignore_empty_lines=False,
+            invalid_row_handler=self._handle_invalid_row,
+        )
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=include_columns,
+            column_types={name: value_type for name in names},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+            null_values=[],
+        )
+
+        if os.path.getsize(self.file_path) <= _IN_MEMORY_LIMIT:
+            table = pa_csv.read_csv(
+                self.file_path,
+                read_options=read_options,
+                parse_options=parse_options,
+                convert_options=convert_options,
+            )
+            self._reader = iter(table.to_batches())
+        else:
+            self._reader = pa_csv.open_csv(
+                self.file_path,
+                read_options=read_options,
+                parse_options=parse_options,
+                convert_options=convert_options,
+            )
+        return self
+
+    def __iter__(self) -> Iterator[pa.RecordBatch]:
+        skip_header = self.header
+        for batch in self._reader:
+            if skip_header and batch.num_rows > 0:
+                batch = batch.slice(1)
+                skip_header = False
+            if not self.column_names:
+                batch = batch.select([])
+            yield batch
+
+    def close(self) -> None:
+        self._reader = None
+
+
+class ArrowCSVScanner(CSVScanner):
+    """Allows to iterate over record batches (created by ArrowCSVLoader) and generate a schema.
+
+    Types follow CSVScanner exactly. Whole columns of a batch are first
+    checked against the current type with pyarrow compute functions,
+    values are checked one by one only if that check fails. Binary
+    values are only decoded then, checks of the whole columns match
+    ascii patterns and vocabularies encoded like the file.
+    """
+
+    def __init__(self, frame: ArrowCSVLoader, *args, **kwargs):
+        super().__init__(frame, *args, **kwargs)
+
+        if isinstance(self._nulls, frozenset):
+            self._arrow_nulls = self._get_vocabulary(self._nulls)
+            self._arrow_booleans = self._get_vocabulary(self._nulls | self._booleans)
+        else:
+            # Case insensitive vocabularies are only checked value by value
+            self._arrow_nulls = self._arrow_booleans = None
+
+    def _get_vocabulary(self, values: Iterable[str]) -> pa.Array:
+        encoding = self.frame.value_encoding
+        if encoding is None:
+            return pa.array(sorted(values), pa.string())
+        encoded = []
+        for value in sorted(values):
+            try:
+                encoded.append(value.encode(encoding))
+            except UnicodeEncodeError:
+                # Can't be found in the file as it is
+                continue
+        return pa.array(encoded, pa.binary())
+
+    def _get_values(self, column: pa.Array) -> List[str]:
+        """Get values of a column as python strings, decoding binary ones."""
+        values = column.to_pylist()
+        encoding = self.frame.value_encoding
+        if encoding is None:
+            return values
+        errors = self.frame.errors
+        return [value.decode(encoding, errors) for value in values]
+
+    def _is_date_column(self, column: pa.Array, nulls: pa.Array) -> bool:
+        """Check if all the values of a column are plain iso dates/timestamps (or nulls)."""
+        mask = pc.or_(
+            pc.match_substring_regex(column, _RE2_PATTERN_DATE),
+            pc.match_substring_regex(column, _RE2_PATTERN_TIMESTAMP),
+        )
+        if pc.all(pc.or_(mask, nulls)).as_py() is False:
+            return False
+        if self.frame.value_encoding is not None:
+            try:
+                # Dates are ascii, but nulls don't have to be
+                column = column.cast(pa.string())
+            except pa.ArrowInvalid:
+                return False
+        # Shape is right, check if dates are valid (like 2022-02-30)
+        valid = nulls
+        for format in _DATE_FORMATS:
+            parsed = pc.strptime(column, format=format, unit="s", error_is_null=True)
+            valid = pc.or_(valid, pc.is_valid(parsed))
+        return pc.all(valid).as_py() is not False
+
+    def _get_column_dtype(self, column: pa.Array, dtype: str) -> Union[str, None]:
+        """Get type of a column with pyarrow compute functions.
+
+        Returns None if the column has to be checked value by value.
+        """
+        if self._arrow_nulls is None or dtype in ("unknown", "json"):
+            return None
+        if dtype == "boolean":
+            if (
+                pc.all(pc.is_in(column, value_set=self._arrow_booleans)).as_py()
+                is False
+            ):
+                return None
+            return dtype
+
+        nulls = pc.is_in(column, value_set=self._arrow_nulls)
+        if dtype in ("integer", "float"):
+            pattern = _RE2_PATTERN_INT if dtype == "integer" else _RE2_PATTERN_FLOAT
+            mask = pc.or_(pc.match_substring_regex(column, pattern), nulls)
+            if pc.all(mask).as_py() is False:
+                return None
+            return dtype
+
+        # Every date or timestamp value changes the type to its own,
+        # so only the last non-null value decides
+        if not self._is_date_column(column, nulls):
+            return None
+        values = pc.filter(column, pc.invert(nulls))
+        if len(values) == 0:
+            return dtype
+        return self._get_dtype(self._get_values(values[-1:])[0], dtype)
+
+    def get_schema(self) -> Dict:
+        head = self.frame.column_names
+
+        types = ["unknown"] * len(head)
+
+        for batch in self.frame:
+            for idx, column in enumerate(batch.columns):
+                dtype = types[idx]
+                if dtype == "string":
+                    continue
+                column_dtype = self._get_column_dtype(column, dtype)
+                if column_dtype is not None:
+                    types[idx] = column_dtype
+                    continue
+
+                previous = None
+                for value in self._get_values(column):
+                    # Resolving the same value twice never changes the type
+                    if value != previous:
+                        dtype = self._get_dtype(value, dtype)
+                        previous = value
+                types[idx] = dtype
+
+        return dict(zip(head, types))
+
+    def get_state(self) -> SchemaState:
+        head = self.frame.column_names
+
+        states = [TYPES] * len(head)
+
+        for batch in self.frame:
+            for idx, column in enumerate(batch.columns):
+                state = states[idx]
+                for value in self._get_values(column):
+                    state = self._get_transitions(value, state)
+                states[idx] = state
+
+        return SchemaState(
+            {name: ColumnState(state) for name, state in zip(head, states)}
+        )
+
+    def get_drift(self, baseline: Dict[str, str], early_exit: bool = True) -> Dict:
+        head = self.frame.column_names
+        detector = DriftDetector(
+            self._select_baseline(baseline, head, self.frame.columns)
+        )
+        if detector.set_columns(head) and early_exit:
+            return detector.report(complete=False)
+
+        types = ["unknown"] * len(head)
+        checked = [idx for idx, name in enumerate(head) if detector.can_drift(name)]
+
+        for batch in self.frame:
+            for idx in checked:
+                column, dtype = batch.column(idx), types[idx]
+                if dtype == "string":
+                    continue
+                # Column check only tells the type after the last value, dates
+                # widened to timestamps on the way can still end as dates
+                column_dtype = self._get_column_dtype(column, dtype)
+                if column_dtype is not None:
+                    types[idx] = column_dtype
+                    if column_dtype != dtype:
+                        if detector.update(head[idx], column_dtype) and early_exit:
+                            return detector.report(complete=False)
+                    continue
+
+                previous = None
+                for value in self._get_values(column):
+                    if value == previous:
+                        continue
+                    previous = value
+                    new_dtype = self._get_dtype(value, dtype)
+                    if new_dtype != dtype:
+                        dtype = new_dtype
+                        if detector.update(head[idx], dtype) and early_exit:
+                            return detector.report(complete=False)
+                types[idx] = dtype
+
+        return detector.report()
@@ -0,0 +1,197 @@
+import os
+import json
+import time
+from typing import List, Dict, Union, Tuple
+
+from .logger import logger
+from .state import SchemaState
+
+# How often results are written out to a checkpoint file (seconds)
+CHECKPOINT_INTERVAL = 10.0
+
+
+def _get_stat(file_name: str) -> List[int]:
+    stat = os.stat(file_name)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Checkpoint:
+    """Results of a scan kept in a file, so that an interrupted scan can resume.
+
+    Every line of the file is a json record: options of the scan
+    first, then schemas (with metrics) of files, byte ranges a file
+    was split into and states of its chunks, as they are done. Records
+    are buffered and written out every interval seconds, a record cut
+    short by an interruption is ignored. Records of files that changed
+    since (size or modification time, taken before a file is scanned,
+    see start_file) are ignored too.
+
+    With resume, records of a checkpoint written by a scan with the
+    same options are kept, otherwise the checkpoint starts empty.
+    """
+
+    def __init__(
+        self,
+        file_path: Union[str, os.PathLike],
+        options: Dict,
+        resume: bool = False,
+        interval: float = CHECKPOINT_INTERVAL,
+    ):
+        self.file_path = file_path
+        self.interval = interval
+        # Options go through json, so they compare equal once read back
+        self.options = json.loads(json.dumps(options, default=str))
+
+        self.files = {}
+        self.splits = {}
+        self.chunks = {}
+        # Stats of files being scanned, by absolute path
+        self._stats = {}
+
+        records = self._read() if resume else []
+        # Rewritten, so that a record cut short doesn't run into the next
+        # one, and replaced at once, so that an interruption loses nothing
+        temp_path = f"{file_path}.tmp"
+        self._file = open(temp_path, "wt")
+        self._buffer = []
+        self._flushed = time.monotonic()
+        self._write({"options": self.options})
+        for record in records:
+            self._add(record)
+        self.close()
+        os.replace(temp_path, file_path)
+        self._file = open(file_path, "at")
+
+    def _read(self) -> List[Dict]:
+        try:
+            with open(self.file_path, "rt") as f:
+                lines = f.read().split("\n")
+        except FileNotFoundError:
+            return []
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Cut short by an interruption
+                continue
+        if not records or records[0].get("options") != self.options:
+            logger.warning(
+                f"Checkpoint {self.file_path} was written by a scan with "
+                "different options, starting over"
+            )
+            return []
+        if not records[1:]:
+            return []
+        logger.info(f"Resuming from checkpoint {self.file_path}")
+        return records[1:]
+
+    def _add(self, record: Dict) -> None:
+        """Keep a record read back, if its file didn't change since."""
+        try:
+            if _get_stat(record["file"]) != record["stat"]:
+                return
+        except OSError:
+            return
+        self._keep(record)
+
+    def _keep(self, record: Dict) -> None:
+        file_name = record["file"]
+        if "schema" in record:
+            self.files[file_name] = (record["schema"], record["metrics"])
+        elif "split" in record:
+            self.splits[file_name] = [
+                tuple(byte_range) for byte_range in record["split"]
+            ]
+        else:
+            byte_range = tuple(record["byte_range"])
+            state = SchemaState.from_dict(record["state"])
+            self.chunks.setdefault(file_name, {})[byte_range] = (
+                state,
+                record["metrics"],
+            )
+        self._write(record)
+
+    def _write(self, record: Dict) -> None:
+        self._buffer.append(json.dumps(record, default=str) + "\n")
+        if time.monotonic() - self._flushed >= self.interval:
+            self.flush()
+
+    def start_file(self, file_name: str) -> None:
+        """Take size and modification time of a file, before it's scanned.
+
+        Records of the file are written with them, so that a file
+        changed during its scan is scanned again on resume.
+        """
+        file_name = os.path.abspath(file_name)
+        try:
+            self._stats[file_name] = _get_stat(file_name)
+        except OSError as e:
+            logger.warning(
+                f"Failed to stat file {file_name}, not checkpointing it: {e}"
+            )
+
+    def _add_new(self, file_name: str, **fields) -> None:
+        """Keep a record of a file started before (see start_file)."""
+        file_name = os.path.abspath(file_name)
+        stat = self._stats.get(file_name)
+        if stat is None:
+            logger.warning(
+                f"Size and modification time of file {file_name} are unknown, "
+                "not checkpointing it"
+            )
+            return
+        self._keep(dict(file=file_name, stat=stat, **fields))
+
+    def get_file(self, file_name: str) -> Union[Tuple[Dict[str, str], Dict], None]:
+        """Get schema and metrics of a file done before, if there is one."""
+        return self.files.get(os.path.abspath(file_name))
+
+    def add_file(self, file_name: str, schema: Dict[str, str], metrics: Dict) -> None:
+        self._add_new(file_name, schema=schema, metrics=metrics)
+        # File is done
+        self._stats.pop(os.path.abspath(file_name), None)
+
+    def get_split(self, file_name: str) -> Union[List[Tuple[int, int]], None]:
+        """Get byte ranges a file was split into before, if it was."""
+        return self.splits.get(os.path.abspath(file_name))
+
+    def add_split(self, file_name: str, byte_ranges: List[Tuple[int, int]]) -> None:
+        self._add_new(file_name, split=[list(byte_range) for byte_range in byte_ranges])
+
+    def get_chunk(
+        self, file_name: str, byte_range: Tuple[int, int]
+    ) -> Union[Tuple[SchemaState, Dict], None]:
+        """Get state and metrics of a chunk done before, if there is one."""
+        return self.chunks.get(os.path.abspath(file_name), {}).get(tuple(byte_range))
+
+    def add_chunk(
+        self,
+        file_name: str,
+        byte_range: Tuple[int, int],
+        state: SchemaState,
+        metrics: Dict,
+    ) -> None:
+        self._add_new(
+            file_name,
+            byte_range=list(byte_range),
+            state=state.to_dict(),
+            metrics=metrics,
+        )
+
+    def flush(self) -> None:
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        self._buffer = []
+        self._flushed = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,304 @@
+import os
+import time
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+from collections import deque
+from typing import List, Dict, Union, Tuple
+
+import ujson
+
+from .processor import get_engine, scan_file
+from .logger import logger, traceback_format
+
+_HEADER = struct.Struct("!I")
+
+
+def send_message(connection: socket.socket, message: Dict) -> None:
+    """Send a length prefixed json message."""
+    payload = ujson.dumps(message).encode("utf-8")
+    connection.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def receive_message(connection: socket.socket) -> Union[Dict, None]:
+    """Receive a length prefixed json message, None if connection was closed."""
+    header = _receive_exactly(connection, _HEADER.size)
+    if header is None:
+        return None
+    payload = _receive_exactly(connection, _HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return ujson.loads(payload.decode("utf-8"))
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> Union[bytes, None]:
+    chunks = []
+    while size > 0:
+        chunk = connection.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class _CoordinatorHandler(socketserver.BaseRequestHandler):
+    """Serves a single worker connection.
+
+    Every worker message (ready, result or error) is answered with
+    a next task, a request to wait or a done message. Task held by
+    the worker when connection is lost gets queued again.
+    """
+
+    def setup(self):
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.request.settimeout(self.server.coordinator.task_timeout)
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = "{}:{}".format(*self.client_address[:2])
+        logger.debug(f"Worker {worker} connected")
+
+        task = None
+        try:
+            while True:
+                message = receive_message(self.request)
+                if message is None:
+                    break
+
+                if message.get("type") == "result" and task is not None:
+                    coordinator._complete(
+                        task, message.get("schema", {}), message.get("metrics", {})
+                    )
+                    task = None
+                elif message.get("type") == "error" and task is not None:
+                    logger.error(
+                        f"Error scanning file {os.path.basename(task)} "
+                        f"on worker {worker}: {message.get('error')}"
+                    )
+                    coordinator._complete(task, {})
+                    task = None
+
+                task = coordinator._next_task()
+                if task is not None:
+                    send_message(
+                        self.request,
+                        dict(
+                            type="task",
+                            path=task,
+                            file_type=coordinator.type_,
+                            engine=coordinator.engine,
+                            loader_options=coordinator.loader_options,
+                            scanner_options=coordinator.scanner_options,
+                        ),
+                    )
+                elif coordinator.is_done():
+                    send_message(self.request, dict(type="done"))
+                    break
+                else:
+                    send_message(
+                        self.request, dict(type="wait", delay=coordinator.poll_delay)
+                    )
+        except (OSError, ValueError) as e:
+            logger.warning(f"Lost connection to worker {worker}: {e}")
+        finally:
+            if task is not None:
+                coordinator._retry(task, worker)
+            logger.debug(f"Worker {worker} disconnected")
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator:
+    """Hands out scan tasks to workers over TCP and collects schemas.
+
+    Workers (see Worker) can run on any host that sees the files under
+    the same paths. A file is queued again if the worker scanning it
+    disconnects (or does not answer within task_timeout), up to
+    max_retries times, after which an empty schema is recorded for it.
+    """
+
+    def __init__(
+        self,
+        file_list: List[str],
+        type_: str,
+        engine: str = "python",
+        loader_options: Union[Dict, None] = None,
+        scanner_options: Union[Dict, None] = None,
+        host: str = "0.0.0.0",
+        port: int = 0,
+        max_retries: int = 2,
+        task_timeout: Union[float, None] = None,
+        poll_delay: float = 0.5,
+    ):
+        get_engine(type_, engine)
+
+        self.type_ = type_
+        self.engine = engine
+        self.loader_options = loader_options or {}
+        self.scanner_options = scanner_options or {}
+        self.file_list = list(file_list)
+        self.host = host
+        self.port = port
+        self.max_retries = max_retries
+        self.task_timeout = task_timeout
+        self.poll_delay = poll_delay
+
+        self._pending = deque(self.file_list)
+        self._attempts = {}
+        self._results = {}
+        self.metrics = {}
+        self._condition = threading.Condition()
+
+        self._server = None
+        self._thread = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Address the coordinator listens on (available after start)."""
+        return self._server.server_address[:2]
+
+    def start(self) -> None:
+        self._server = _CoordinatorServer((self.host, self.port), _CoordinatorHandler)
+        self._server.coordinator = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info("Coordinator listening on {}:{}".format(*self.address))
+
+    def wait(self, timeout: Union[float, None] = None) -> Dict[str, Dict[str, str]]:
+        """Wait for all the tasks and return schemas by file path."""
+        with self._condition:
+            if not self._condition.wait_for(self.is_done, timeout=timeout):
+                raise TimeoutError("Distributed scan did not finish in time")
+            return {file_name: self._results[file_name] for file_name in self.file_list}
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def run(self, timeout: Union[float, None] = None) -> Dict[str, Dict[str, str]]:
+        self.start()
+        try:
+            return self.wait(timeout)
+        finally:
+            # Give waiting workers a chance to receive done message
+            time.sleep(self.poll_delay)
+            self.stop()
+
+    def is_done(self) -> bool:
+        return len(self._results) == len(self.file_list)
+
+    def _next_task(self) -> Union[str, None]:
+        with self._condition:
+            if not self._pending:
+                return None
+            return self._pending.popleft()
+
+    def _complete(
+        self, file_name: str, schema: Dict[str, str], metrics: Dict = None
+    ) -> None:
+        with self._condition:
+            self._results[file_name] = schema
+            if metrics is not None:
+                self.metrics[file_name] = metrics
+            self._condition.notify_all()
+
+    def _retry(self, file_name: str, worker: str) -> None:
+        with self._condition:
+            attempts = self._attempts.get(file_name, 0) + 1
+            self._attempts[file_name] = attempts
+            if attempts > self.max_retries:
+                logger.error(
+                    f"Giving up on file {os.path.basename(file_name)} "
+                    f"after {attempts} lost workers"
+                )
+                self._results[file_name] = {}
+                self._condition.notify_all()
+            else:
+                logger.warning(
+                    f"Worker {worker} lost while scanning "
+                    f"{os.path.basename(file_name)}, queuing it again"
+                )
+                self._pending.appendleft(file_name)
+
+
+class Worker:
+    """Connects to a Coordinator and scans files it receives."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        connect_retries: int = 10,
+        connect_delay: float = 1.0,
+    ):
+        self.host = host
+        self.port = port
+        self.connect_retries = connect_retries
+        self.connect_delay = connect_delay
+
+    def _connect(self) -> socket.socket:
+        for attempt in range(self.connect_retries + 1):
+            try:
+                return socket.create_connection((self.host, self.port))
+            except OSError:
+                if attempt == self.connect_retries:
+                    raise
+                time.sleep(self.connect_delay)
+
+    def run(self) -> None:
+        with self._connect() as connection:
+            send_message(connection, dict(type="ready"))
+            while True:
+                message = receive_message(connection)
+                if message is None or message.get("type") == "done":
+                    break
+                if message.get("type") == "wait":
+                    time.sleep(message.get("delay", 0.5))
+                    send_message(connection, dict(type="ready"))
+                    continue
+
+                try:
+                    loaderClass, scannerClass = get_engine(
+                        message["file_type"], message.get("engine", "python")
+                    )
+                    schema, metrics = scan_file(
+                        message["path"],
+                        loaderClass,
+                        scannerClass,
+                        message.get("loader_options", {}),
+                        message.get("scanner_options", {}),
+                    )
+                    send_message(
+                        connection,
+                        dict(type="result", schema=schema, metrics=metrics),
+                    )
+                except Exception as exception:
+                    logger.debug(
+                        f"Exception traceback:\n{(traceback_format(exception))}"
+                        if len(traceback_format(exception)) > 0
+                        else "No exception traceback"
+                    )
+                    send_message(connection, dict(type="error", error=str(exception)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Data scanner worker for distributed scans."
+    )
+    parser.add_argument("--host", action="store", required=True, dest="host")
+    parser.add_argument("--port", action="store", type=int, required=True, dest="port")
+    args = parser.parse_args()
+
+    Worker(args.host, args.port).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,397 @@
+import io
 import os
 import sys
 import abc
 import csv
-import ijson
-from typing import Union, Iterable, Dict, BinaryIO
+import codecs
+import time
+import queue
+import itertools
+import threading
+from operator import itemgetter
+from typing import Union, Iterable, Iterator, Dict, BinaryIO, Tuple, List, Callable
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+_SNIFFED_DELIMITERS = ",;\t|"
+
+# Sniffing results by file fingerprint
+_sniff_cache = {}
+_encoding_cache = {}
+
+# Bytes of a file encoding is detected from
+_ENCODING_PREFIX_SIZE = 64 * 1024
+
+# Codec error handler decoding invalid bytes one by one as windows-1252
+# (or latin-1, for the few bytes it leaves undefined), see decode_fallback
+FALLBACK_ERRORS = "data_scanner.fallback"
+_ERRORS = {"fallback": FALLBACK_ERRORS}
+
+# ijson backends, fastest first
+IJSON_BACKENDS = ("yajl2_c", "yajl2_cffi", "yajl2", "python")
+
+# Loaded ijson backends by name (None if not available)
+_ijson_backends = {}
+
+# Bigger files are read by ijson in bigger chunks
+_BIG_FILE_SIZE = 16 * 1024 * 1024
+_BIG_FILE_BUFFER_SIZE = 1024 * 1024
+_BUFFER_SIZE = 64 * 1024
+
+# Read ahead defaults, number of blocks kept in memory is bounded by depth
+PREFETCH_BLOCK_SIZE = 1024 * 1024
+PREFETCH_DEPTH = 4
+
+
+def file_fingerprint(file_path: Union[str, os.PathLike]) -> Tuple:
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def detect_bom(prefix: bytes) -> Union[str, None]:
+    """Get encoding from byte order mark, if there is one."""
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    return None
+
+
+def detect_encoding(prefix: bytes, truncated: bool = False) -> str:
+    """Detect encoding from a prefix of a file (truncated, if there is more).
+
+    Byte order mark decides if there is one. Otherwise it's UTF-8,
+    unless the prefix is not valid UTF-8, then it's most likely
+    a single byte encoding: windows-1252, or latin-1 if that fails.
+    """
+    encoding = detect_bom(prefix)
+    if encoding is not None:
+        return encoding
+    try:
+        # Prefix can end halfway through a character
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=not truncated)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        prefix.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def sniff_encoding(
+    file_path: Union[str, os.PathLike], prefix_size: int = _ENCODING_PREFIX_SIZE
+) -> str:
+    """Detect encoding from a bounded prefix of a file (see detect_encoding).
+
+    Results are cached by file fingerprint.
+    """
+    fingerprint = file_fingerprint(file_path)
+    if fingerprint not in _encoding_cache:
+        with open(file_path, "rb") as f:
+            prefix = f.read(prefix_size)
+            truncated = bool(f.read(1))
+        _encoding_cache[fingerprint] = detect_encoding(prefix, truncated)
+    return _encoding_cache[fingerprint]
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    """Check if ascii characters are single bytes in an encoding (not UTF-16/32)."""
+    return not codecs.lookup(encoding).name.startswith(("utf-16", "utf-32"))
+
+
+def get_errors(errors: str) -> str:
+    """Get name of a codec error handler, "fallback" stands for FALLBACK_ERRORS."""
+    return _ERRORS.get(errors, errors)
+
+
+def _get_fallback_char(byte: int) -> str:
+    try:
+        return bytes([byte]).decode("cp1252")
+    except UnicodeDecodeError:
+        return chr(byte)
+
+
+_FALLBACK_CHARS = [_get_fallback_char(byte) for byte in range(256)]
+
+
+def decode_fallback(error: UnicodeError) -> Tuple[str, int]:
+    """Codec error handler decoding invalid bytes as windows-1252 (or latin-1).
+
+    Decoder only calls it for bytes it fails on, so a mostly UTF-8 file
+    with a few stray single byte characters is still decoded at the
+    speed of UTF-8 and never fails.
+    """
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    data = error.object[error.start : error.end]
+    return "".join(_FALLBACK_CHARS[byte] for byte in data), error.end
+
+
+codecs.register_error(FALLBACK_ERRORS, decode_fallback)
+
+
+def sniff_dialect(
+    file_path: Union[str, os.PathLike], prefix_size: int = _ENCODING_PREFIX_SIZE
+) -> Tuple[str, Dict]:
+    """Detect encoding and CSV dialect from a bounded prefix of a file.
+
+    Returns the encoding (see detect_encoding) and csv.reader formatting
+    parameters. Results are cached by file fingerprint, so every file
+    is sniffed once.
+    """
+    fingerprint = file_fingerprint(file_path)
+    if fingerprint in _sniff_cache:
+        return _sniff_cache[fingerprint]
+
+    with open(file_path, "rb") as f:
+        prefix = f.read(prefix_size)
+        truncated = bool(f.read(1))
+
+    encoding = detect_encoding(prefix, truncated)
+    sample = prefix.decode(encoding, errors="ignore")
+    if truncated and "\n" in sample:
+        # Last line is most likely incomplete
+        sample = sample[: sample.rindex("\n")]
+
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=_SNIFFED_DELIMITERS)
+        # Quote escaping is left at csv defaults, since a prefix
+        # without escaped quotes says nothing about the rest of the file
+        dialect = dict(
+            delimiter=dialect.delimiter,
+            quotechar=dialect.quotechar or '"',
+            skipinitialspace=dialect.skipinitialspace,
+        )
+    except csv.Error:
+        dialect = {}
+
+    _sniff_cache[fingerprint] = (encoding, dialect)
+    return encoding, dialect
+
+
+def split_csv(
+    file_path: Union[str, os.PathLike],
+    n_chunks: int,
+    quotechar: str = '"',
+    block_size: int = 1024 * 1024,
+) -> List[Tuple[int, int]]:
+    """Split a CSV file into byte ranges of similar size ending with full rows.
+
+    A range can only end on a newline preceded by an even number
+    of quote characters, so newlines within quoted values are never
+    used. Returns at most n_chunks (start, end) ranges.
+    """
+    size = os.path.getsize(file_path)
+    targets = [size * idx // n_chunks for idx in range(1, n_chunks)]
+    quote = quotechar.encode("utf-8")
+
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        # Number of quotes before offset
+        offset, quotes = 0, 0
+        for block in iter(lambda: f.read(block_size), b""):
+            counted, pos = 0, 0
+            while targets:
+                pos = max(pos, targets[0] - offset)
+                pos = block.find(b"\n", pos)
+                if pos == -1:
+                    break
+                quotes += block.count(quote, counted, pos)
+                counted = pos
+                pos += 1
+                if quotes % 2 == 0:
+                    bounds.append(offset + pos)
+                    targets = [target for target in targets if target > offset + pos]
+            quotes += block.count(quote, counted)
+            offset += len(block)
+
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def resolve_columns(columns: Iterable[Union[str, int]], head: List[str]) -> List[int]:
+    """Get indexes of selected columns, by name or (0-based) index, in file order.
+
+    Columns missing from the file are ignored.
+    """
+    names = {column for column in columns if isinstance(column, str)}
+    indexes = {column for column in columns if isinstance(column, int)}
+    return [idx for idx, name in enumerate(head) if name in names or idx in indexes]
+
+
+def get_projection(indexes: List[int]) -> Callable[[List[str]], Tuple]:
+    """Get a function picking values at indexes from a row, as a tuple."""
+    if len(indexes) == 1:
+        idx = indexes[0]
+        return lambda row: (row[idx],)
+    if not indexes:
+        return lambda row: ()
+    return itemgetter(*indexes)
+
+
+def match_key_path(
+    name: str, prefixes: Iterable[str], sep: str = "_"
+) -> Union[bool, None]:
+    """Check if a flattened key is selected by any of key path prefixes.
+
+    A prefix selects the key itself and all the keys nested under it.
+    Returns None if the key is not selected, but some keys nested under
+    it are, so an object has to be flattened to find them.
+    """
+    nested = False
+    for prefix in prefixes:
+        if name == prefix or name.startswith(prefix + sep):
+            return True
+        if prefix.startswith(name + sep):
+            nested = True
+    return None if nested else False
+
+
+class _FileRange(io.RawIOBase):
+    """Read only given number of bytes of an open binary file."""
+
+    def __init__(self, file: BinaryIO, size: int):
+        self._file = file
+        self._remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+class PrefetchReader(io.RawIOBase):
+    """Read a binary file ahead in a background thread.
+
+    Blocks of block_size bytes are read into a queue of at most depth
+    blocks, so reading the file overlaps with parsing it. Time spent
+    waiting for blocks that were not read yet is kept in io_wait.
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        block_size: int = PREFETCH_BLOCK_SIZE,
+        depth: int = PREFETCH_DEPTH,
+    ):
+        self._file = file
+        self._block_size = block_size
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._block = memoryview(b"")
+        self._eof = False
+        self.io_wait = 0.0
+
+        self._thread = threading.Thread(target=self._read_ahead, daemon=True)
+        self._thread.start()
+
+    def _read_ahead(self) -> None:
+        try:
+            while not self._stop.is_set():
+                block = self._file.read(self._block_size)
+                self._queue.put(block)
+                if not block:
+                    break
+        except Exception as exception:
+            self._queue.put(exception)
+
+    def _next_block(self) -> bool:
+        """Wait for the next block, False at the end of file."""
+        if self._eof:
+            return False
+        start = time.perf_counter()
+        block = self._queue.get()
+        self.io_wait += time.perf_counter() - start
+        if isinstance(block, Exception):
+            self._eof = True
+            raise block
+        if not block:
+            self._eof = True
+            return False
+        self._block = memoryview(block)
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return self.readall()
+        if not self._block and not self._next_block():
+            return b""
+        data, self._block = self._block[:size], self._block[size:]
+        return data.tobytes()
+
+    def readinto(self, buffer) -> int:
+        if not self._block and not self._next_block():
+            return 0
+        size = min(len(buffer), len(self._block))
+        memoryview(buffer).cast("B")[:size] = self._block[:size]
+        self._block = self._block[size:]
+        return size
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._stop.set()
+        # Make room for a block the thread might be waiting to put
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._file.close()
+        super().close()
+
+
+def get_ijson_backend(name: Union[str, None] = None):
+    """Get ijson backend by name, or the fastest one available if name is None."""
+    for backend_name in (name,) if name is not None else IJSON_BACKENDS:
+        if backend_name not in _ijson_backends:
+            # Imported here, only json files need it
+            import ijson
+
+            try:
+                _ijson_backends[backend_name] = ijson.get_backend(backend_name)
+            except ImportError:
+                _ijson_backends[backend_name] = None
+        backend = _ijson_backends[backend_name]
+        if backend is not None:
+            return backend
+    raise ImportError(f"ijson backend not available: '{name}'")
+
+
+def get_buffer_size(file_path: Union[str, os.PathLike]) -> int:
+    """Get size of chunks ijson should read file in."""
+    if os.path.getsize(file_path) > _BIG_FILE_SIZE:
+        return _BIG_FILE_BUFFER_SIZE
+    return _BUFFER_SIZE
 
 
 class Loader(abc.ABC):
     """Template for loader subclasses.
 
     Loaders should allow to iterate through the file row by row.
+    Details about reading a file (if any) are kept in metrics.
     """
 
     @abc.abstractmethod
@@ -28,26 +410,179 @@ class Loader(abc.ABC):
 
 
 class CSVLoader(Loader):
-    """Allows to iterate over a CSV file."""
+    """Allows to iterate over a CSV file.
+
+    With sniff enabled, delimiter and quoting are detected from the
+    beginning of the file before reading it. Encoding is detected from
+    it too, unless given (see detect_encoding). Bytes that can't be
+    decoded are handled according to errors (like in open), which
+    can also be "fallback" (see decode_fallback).
+    With byte_range, only rows within (start, end) bytes are read (see
+    split_csv), preceded by the first row (header) of the file.
+    With prefetch, file is read ahead in a background thread (see
+    PrefetchReader), time spent waiting for reads is kept in metrics.
+    """
 
-    def __init__(self, file_path: Union[str, os.PathLike]):
+    def __init__(
+        self,
+        file_path: Union[str, os.PathLike],
+        sniff: bool = False,
+        byte_range: Union[Tuple[int, int], None] = None,
+        prefetch: bool = False,
+        prefetch_block_size: int = PREFETCH_BLOCK_SIZE,
+        prefetch_depth: int = PREFETCH_DEPTH,
+        encoding: Union[str, None] = None,
+        errors: str = "strict",
+    ):
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: '{file_path}'")
 
         self.file_path = file_path
+        self.sniff = sniff
+        self.encoding = encoding
+        self.errors = get_errors(errors)
+        self.byte_range = byte_range
+        self.prefetch = prefetch
+        self.prefetch_block_size = prefetch_block_size
+        self.prefetch_depth = prefetch_depth
+        self.metrics = {}
 
         self._file = None
+        self._prefetch_reader = None
         self._reader = None
 
     def open(self) -> Iterable:
-        self._file = open(self.file_path, "rt")
-        self._reader = csv.reader(self._file)
+        encoding, dialect = self.encoding, {}
+        if self.sniff:
+            sniffed_encoding, dialect = sniff_dialect(self.file_path)
+            encoding = encoding or sniffed_encoding
+            self.metrics = dict(encoding=encoding, dialect=dialect)
+        elif encoding is None:
+            encoding = sniff_encoding(self.file_path)
+
+        if self.byte_range is None and not self.prefetch:
+            self._file = open(
+                self.file_path, "rt", encoding=encoding, errors=self.errors
+            )
+            self._reader = CSVReader(self._file, **dialect)
+            return self._reader
+
+        start, end = self.byte_range or (0, None)
+        raw = open(self.file_path, "rb")
+        if end is not None:
+            raw.seek(start)
+            raw = _FileRange(raw, end - start)
+        if self.prefetch:
+            raw = self._prefetch_reader = PrefetchReader(
+                raw, self.prefetch_block_size, self.prefetch_depth
+            )
+        self._file = io.TextIOWrapper(
+            io.BufferedReader(raw), encoding=encoding, errors=self.errors
+        )
+        head = None
+        if start > 0:
+            with open(self.file_path, "rt", encoding=encoding, errors=self.errors) as f:
+                head = next(csv.reader(f, **dialect), [])
+        self._reader = CSVReader(self._file, head, **dialect)
         return self._reader
 
     def close(self) -> None:
         self._reader = None
         self._file.close()
         self._file = None
+        if self._prefetch_reader is not None:
+            self.metrics["io_wait"] = self._prefetch_reader.io_wait
+            self._prefetch_reader = None
+
+
+class CSVReader:
+    """Iterate over rows of a CSV file, like csv.reader.
+
+    Rows can be read with only selected columns (see select), then
+    columns after the last selected one are never split and lines
+    without quotes are not tokenized by csv module at all.
+    First row of the file can be given, if reading starts mid-file
+    (line numbers are unknown then).
+    """
+
+    def __init__(
+        self, file: io.TextIOBase, head: Union[List[str], None] = None, **dialect
+    ):
+        self.dialect = dialect
+        self._file = file
+        self._reader = csv.reader(file, **dialect)
+        self._rows = self._reader
+        self._mid_file = head is not None
+        if self._mid_file:
+            self._rows = itertools.chain([head], self._reader)
+        # Lines counted by select, once csv module is bypassed
+        self._line_num = None
+
+    @property
+    def line_num(self) -> Union[int, None]:
+        if self._mid_file:
+            return None
+        if self._line_num is not None:
+            return self._line_num
+        return self._reader.line_num
+
+    def __iter__(self) -> Iterator[List[str]]:
+        return iter(self._rows)
+
+    def __next__(self) -> List[str]:
+        return next(self._rows)
+
+    def _can_split(self) -> bool:
+        """Check if lines without quotes can be split on delimiter."""
+        delimiter = self.dialect.get("delimiter", ",")
+        return (
+            len(delimiter) == 1
+            and delimiter not in "\r\n"
+            and not self.dialect.get("skipinitialspace", False)
+            and self.dialect.get("escapechar") is None
+            and self.dialect.get("quoting", csv.QUOTE_MINIMAL) == csv.QUOTE_MINIMAL
+        )
+
+    def select(self, indexes: List[int], width: int) -> Iterator[Union[Tuple, None]]:
+        """Iterate over the remaining rows, with values at indexes only.
+
+        Rows that don't have width values are None.
+        """
+        project = get_projection(indexes)
+        if not self._can_split():
+            for row in self._rows:
+                yield project(row) if len(row) == width else None
+            return
+
+        delimiter = self.dialect.get("delimiter", ",")
+        quotechar = self.dialect.get("quotechar", '"')
+        last = max(indexes) + 1 if indexes else 0
+
+        # Lines are read straight from the file from now on
+        line_num = self.line_num
+        self._line_num = line_num
+        lines = iter(self._file)
+        for line in lines:
+            if quotechar in line:
+                # Quoted values can hold delimiters and span lines
+                reader = csv.reader(itertools.chain([line], lines), **self.dialect)
+                row = next(reader)
+                if line_num is not None:
+                    line_num += reader.line_num
+                    self._line_num = line_num
+                yield project(row) if len(row) == width else None
+                continue
+
+            if line_num is not None:
+                line_num += 1
+                self._line_num = line_num
+            if line[-1:] == "\n":
+                line = line[:-1]
+            if not line or line.count(delimiter) + 1 != width:
+                # Empty lines have no values at all
+                yield None
+                continue
+            yield project(line.split(delimiter, last))
 
 
 class JSONReader:
@@ -59,14 +594,23 @@ class JSONReader:
     This class is meant to be used by JSONLoader.
     """
 
-    def __init__(self, file: BinaryIO):
-        self.type = self.peek_type(file)
+    def __init__(
+        self,
+        file: BinaryIO,
+        backend=None,
+        buf_size: int = _BUFFER_SIZE,
+        type_: Union[str, None] = None,
+    ):
+        if backend is None:
+            backend = get_ijson_backend()
+        # Type has to be given for files that can't be seeked
+        self.type = type_ or self.peek_type(file)
         if self.type == "list":
-            self.json_file = ijson.items(file, "item")
+            self.json_file = backend.items(file, "item", buf_size=buf_size)
         elif self.type == "empty":
             self.json_file = iter(())
         else:
-            self.json_file = ijson.items(file, "")
+            self.json_file = backend.items(file, "", buf_size=buf_size)
 
     @staticmethod
     def peek_type(json_file: BinaryIO) -> Union[str, None]:
@@ -92,7 +636,10 @@ class JSONReader:
 
     @staticmethod
     def flatten(
-        json: Dict, sep: str = "_", max_level: int = sys.getrecursionlimit()
+        json: Dict,
+        sep: str = "_",
+        max_level: int = sys.getrecursionlimit(),
+        parent_key: str = "",
     ) -> Dict:
         result = {}
 
@@ -104,10 +651,38 @@ class JSONReader:
                 else:
                     result[new_key] = value
 
-        _recurse(json)
+        _recurse(json, parent_key)
 
         return result
 
+    def select(self, prefixes: List[str], sep: str = "_") -> Iterator[Dict]:
+        """Iterate over the remaining records, flattened to keys selected by prefixes.
+
+        Objects with no selected keys under them are not flattened
+        at all (see match_key_path).
+        """
+        matches = {}
+
+        def _recurse(json: Dict, result: Dict, parent_key: str = ""):
+            for key, value in json.items():
+                new_key = parent_key + sep + key if parent_key else key
+                if new_key in matches:
+                    match = matches[new_key]
+                else:
+                    match = matches[new_key] = match_key_path(new_key, prefixes, sep)
+                if match:
+                    if isinstance(value, dict):
+                        result.update(self.flatten(value, sep, parent_key=new_key))
+                    else:
+                        result[new_key] = value
+                elif match is None and isinstance(value, dict):
+                    _recurse(value, result, new_key)
+
+        for record in self.json_file:
+            result = {}
+            _recurse(record, result)
+            yield result
+
     def __next__(self) -> Dict:
         return self.flatten(next(self.json_file))
 
@@ -116,20 +691,101 @@ class JSONReader:
 
 
 class JSONLoader(Loader):
-    """Allows to iterate over a JSON file."""
+    """Allows to iterate over a JSON file.
+
+    File is parsed with the given ijson backend, or the fastest
+    one available (backend used is kept in metrics). With prefetch,
+    file is read ahead in a background thread (see PrefetchReader).
+    """
 
-    def __init__(self, file_path: Union[str, os.PathLike]):
+    def __init__(
+        self,
+        file_path: Union[str, os.PathLike],
+        backend: Union[str, None] = None,
+        prefetch: bool = False,
+        prefetch_block_size: int = PREFETCH_BLOCK_SIZE,
+        prefetch_depth: int = PREFETCH_DEPTH,
+    ):
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: '{file_path}'")
 
         self.file_path = file_path
+        self.backend = get_ijson_backend(backend)
+        self.prefetch = prefetch
+        self.prefetch_block_size = prefetch_block_size
+        self.prefetch_depth = prefetch_depth
+        self.metrics = dict(backend=self.backend.backend_name)
+
+        self._file = None
+        self._reader = None
+
+    def open(self) -> Iterable:
+        self._file = open(self.file_path, "rb")
+        type_ = JSONReader.peek_type(self._file)
+        if self.prefetch:
+            self._file = PrefetchReader(
+                self._file, self.prefetch_block_size, self.prefetch_depth
+            )
+        self._reader = JSONReader(
+            self._file, self.backend, get_buffer_size(self.file_path), type_
+        )
+        return self._reader
+
+    def close(self) -> None:
+        self._reader = None
+        self._file.close()
+        if isinstance(self._file, PrefetchReader):
+            self.metrics["io_wait"] = self._file.io_wait
+        self._file = None
+
+
+class JSONEventLoader(Loader):
+    """Allows to iterate over parse events of a JSON file.
+
+    Records are never built in memory, JSONEventScanner infers
+    types straight from the events. With prefetch, file is read
+    ahead in a background thread (see PrefetchReader).
+    """
+
+    def __init__(
+        self,
+        file_path: Union[str, os.PathLike],
+        backend: Union[str, None] = None,
+        prefetch: bool = False,
+        prefetch_block_size: int = PREFETCH_BLOCK_SIZE,
+        prefetch_depth: int = PREFETCH_DEPTH,
+    ):
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"File not found: '{file_path}'")
+
+        self.file_path = file_path
+        self.backend = get_ijson_backend(backend)
+        self.prefetch = prefetch
+        self.prefetch_block_size = prefetch_block_size
+        self.prefetch_depth = prefetch_depth
+        self.metrics = dict(backend=self.backend.backend_name)
+
+        self._file = None
+        self._reader = None
 
     def open(self) -> Iterable:
         self._file = open(self.file_path, "rb")
-        self._reader = JSONReader(self._file)
+        if JSONReader.peek_type(self._file) == "empty":
+            self._reader = iter(())
+            return self._reader
+
+        if self.prefetch:
+            self._file = PrefetchReader(
+                self._file, self.prefetch_block_size, self.prefetch_depth
+            )
+        self._reader = self.backend.basic_parse(
+            self._file, buf_size=get_buffer_size(self.file_path)
+        )
         return self._reader
 
     def close(self) -> None:
         self._reader = None
         self._file.close()
+        if isinstance(self._file, PrefetchReader):
+            self.metrics["io_wait"] = self._file.io_wait
         self._file = None
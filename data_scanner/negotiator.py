@@ -1,4 +1,8 @@
-from typing import List, Dict
+import os
+import re
+from typing import List, Dict, FrozenSet, Iterable, Union
+
+from .state import TYPES, REACHABLE_TYPES
 
 
 class Negotiator:
@@ -15,15 +19,27 @@ class Negotiator:
         result = {}
 
         for schema in schemas:
-            for key, value in schema.items():
-                if key not in result:
-                    result[key] = value
-                else:
-                    first_value = result[key]
-                    result[key] = cls._get_resolved_type(first_value, value)
+            cls.update(result, schema)
 
         return result
 
+    @classmethod
+    def update(cls, result: Dict[str, str], schema: Dict[str, str]) -> None:
+        """Negotiate a schema into an already reduced one (in place)."""
+        for key, value in schema.items():
+            if key not in result:
+                result[key] = value
+            else:
+                first_value = result[key]
+                result[key] = cls._get_resolved_type(first_value, value)
+
+    @classmethod
+    def get_allowed_types(cls, type_: str) -> FrozenSet[str]:
+        """Types that keep given type unchanged when negotiated with it."""
+        return frozenset(
+            other for other in TYPES if cls._get_resolved_type(type_, other) == type_
+        )
+
     @staticmethod
     def _get_resolved_type(a: str, b: str) -> str:
         if a == "unknown":
@@ -67,3 +83,114 @@ class Negotiator:
             if b in ("timestamp", "date"):
                 return "timestamp"
             return "string"
+
+
+class GroupNegotiator:
+    """Negotiates schemas of files within groups, as they are added.
+
+    Group of a file is found in its path, with a regex (its first
+    group, or the whole match) or a number of leading hive style
+    partition directories (like table=x/date=y/). Files that don't
+    match belong to the "" group, just like all the files if group_by
+    is None.
+    """
+
+    def __init__(self, group_by: Union[str, int, None] = None):
+        self.group_by = group_by
+        self.groups = {}
+        self.files = {}
+
+        self._pattern = re.compile(group_by) if isinstance(group_by, str) else None
+
+    def get_group(self, file_name: str) -> str:
+        if self.group_by is None:
+            return ""
+        if self._pattern is not None:
+            match = self._pattern.search(file_name)
+            if match is None:
+                return ""
+            return match.group(1 if self._pattern.groups else 0) or ""
+
+        directories = os.path.dirname(file_name).split(os.sep)
+        partitions = [directory for directory in directories if "=" in directory]
+        return os.sep.join(partitions[: self.group_by])
+
+    def add(self, file_name: str, schema: Dict[str, str]) -> None:
+        self.files[file_name] = schema
+        Negotiator.update(self.groups.setdefault(self.get_group(file_name), {}), schema)
+
+
+class DriftDetector:
+    """Compares types found by a scanner with a baseline schema.
+
+    A column drifts if the type it ends a scan with widens its baseline
+    type (see Negotiator.get_allowed_types). During a scan, a column
+    drifts as soon as none of the types it can still end with (see
+    REACHABLE_TYPES) is allowed, so a column that goes through a
+    timestamp and ends as a date doesn't drift from a date baseline.
+    Columns missing from the baseline drift right away.
+    """
+
+    def __init__(self, baseline: Dict[str, str]):
+        self.baseline = baseline
+        self.found = {}
+        # Columns that drifted before the end of a scan, in order of drift
+        self.drifted = {}
+
+        self._allowed = {
+            name: Negotiator.get_allowed_types(type_)
+            for name, type_ in baseline.items()
+        }
+        self._columns_known = False
+
+    def set_columns(self, names: Iterable[str]) -> bool:
+        """Record all the columns of a file up front, True if any were added or removed."""
+        for name in names:
+            self.update(name, "unknown")
+        self._columns_known = True
+        return bool(self.drifted) or len(self.found) < len(self.baseline)
+
+    def can_drift(self, name: str) -> bool:
+        """Check if a column can drift (anything fits a string column)."""
+        allowed = self._allowed.get(name)
+        return allowed is None or len(allowed) < len(TYPES)
+
+    def update(self, name: str, type_: str) -> bool:
+        """Record the type a column has during a scan, True if the column drifted."""
+        self.found[name] = type_
+
+        allowed = self._allowed.get(name)
+        if allowed is None or allowed.isdisjoint(REACHABLE_TYPES[type_]):
+            self.drifted[name] = True
+            return True
+        return False
+
+    def report(self, complete: bool = True) -> Dict:
+        """Get columns that changed type, were added or removed.
+
+        Types found are final only if the whole file was scanned
+        (complete), otherwise only columns that can't end with an
+        allowed type are reported. Removed columns are only known if
+        the whole file was scanned or columns were recorded with
+        set_columns.
+        """
+        drifted = dict(self.drifted)
+        if complete:
+            for name, type_ in self.found.items():
+                if name in self._allowed and type_ not in self._allowed[name]:
+                    drifted[name] = True
+
+        changed, added = {}, {}
+        for name in drifted:
+            if name in self.baseline:
+                changed[name] = dict(
+                    baseline=self.baseline[name], found=self.found[name]
+                )
+            else:
+                added[name] = self.found[name]
+
+        removed = []
+        if complete or self._columns_known:
+            removed = [name for name in self.baseline if name not in self.found]
+
+        return dict(changed=changed, added=added, removed=removed, complete=complete)
@@ -1,14 +1,200 @@
 import os
 import time
-import multiprocessing as mp
 import queue
-from typing import List, Dict, Union
+import signal
+import secrets
+import itertools
+from collections import deque
+from contextlib import nullcontext
+from typing import List, Dict, Union, Iterable, Tuple, Set
 from pprint import pformat
 
-from .loader import CSVLoader, JSONLoader
-from .scanner import CSVScanner, JSONScanner
+from .loader import (
+    CSVLoader,
+    JSONLoader,
+    JSONEventLoader,
+    PREFETCH_BLOCK_SIZE,
+    PREFETCH_DEPTH,
+    get_ijson_backend,
+    is_ascii_compatible,
+    sniff_dialect,
+    sniff_encoding,
+    split_csv,
+)
+from .scanner import (
+    CSVScanner,
+    JSONScanner,
+    JSONEventScanner,
+    DEFAULT_NULLS,
+    DEFAULT_BOOLEANS,
+)
 from .logger import logger, traceback_format
-from .negotiator import Negotiator
+from .checkpoint import Checkpoint
+from .negotiator import GroupNegotiator
+from .state import SchemaState
+
+FILE_TYPES = {
+    "csv": (CSVLoader, CSVScanner),
+    "json": (JSONLoader, JSONScanner),
+}
+
+# Rough scan rates of a single process (bytes per second),
+# used to estimate how long a scan will take
+_SCAN_RATES = {
+    ("csv", "python"): 3 * 1024 * 1024,
+    ("csv", "arrow"): 20 * 1024 * 1024,
+    ("json", "python"): 5 * 1024 * 1024,
+    ("json", "streaming"): 5 * 1024 * 1024,
+}
+
+# Time it takes to start worker processes and collect results (seconds)
+_PROCESS_OVERHEAD = 0.5
+
+# Files are not split into chunks smaller than that
+_MIN_CHUNK_SIZE = 8 * 1024 * 1024
+
+# How often workers are checked on (seconds)
+_POLL_INTERVAL = 0.05
+
+# Number of files handed out to a worker at once, including the one it scans
+_WORKER_QUEUE_SIZE = 2
+
+# Processes killed by the kernel when out of memory exit with that code
+_OOM_EXIT_CODE = -getattr(signal, "SIGKILL", 9)
+
+
+def get_rss(pid: int) -> Union[int, None]:
+    """Get resident memory of a process in bytes, None if it's unknown (not on Linux)."""
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_engine(type_: str, engine: str = "python") -> Tuple:
+    """Get loader and scanner classes used to scan files of given type."""
+    assert type_ in FILE_TYPES, "Only json or csv files are supported"
+    assert engine in (
+        "python",
+        "arrow",
+        "streaming",
+    ), "Only python, arrow or streaming engines are supported"
+
+    if engine == "arrow":
+        assert type_ == "csv", "Arrow engine supports only csv files"
+        # Optional dependency, imported only if needed
+        from .arrow import ArrowCSVLoader, ArrowCSVScanner
+
+        return ArrowCSVLoader, ArrowCSVScanner
+    if engine == "streaming":
+        assert type_ == "json", "Streaming engine supports only json files"
+        return JSONEventLoader, JSONEventScanner
+    return FILE_TYPES[type_]
+
+
+def scan_file(
+    file_name: str,
+    loaderClass: Union[CSVLoader, JSONLoader],
+    scannerClass: Union[CSVScanner, JSONScanner],
+    loader_options: Dict,
+    scanner_options: Dict,
+) -> Tuple[Dict[str, str], Dict]:
+    """Scan a single file, return its schema and metrics."""
+    loader = loaderClass(file_name, **loader_options)
+    with loader as frame:
+        scanner = scannerClass(frame, **scanner_options)
+        schema = scanner.get_schema()
+    return schema, {**loader.metrics, **scanner.metrics}
+
+
+def scan_file_state(
+    file_name: str,
+    loaderClass: Union[CSVLoader, JSONLoader],
+    scannerClass: Union[CSVScanner, JSONScanner],
+    loader_options: Dict,
+    scanner_options: Dict,
+) -> Tuple[SchemaState, Dict]:
+    """Scan a single file (or a chunk of it), return its state and metrics."""
+    loader = loaderClass(file_name, **loader_options)
+    with loader as frame:
+        scanner = scannerClass(frame, **scanner_options)
+        state = scanner.get_state()
+    return state, {**loader.metrics, **scanner.metrics}
+
+
+def scan_file_drift(
+    file_name: str,
+    loaderClass: Union[CSVLoader, JSONLoader],
+    scannerClass: Union[CSVScanner, JSONScanner],
+    loader_options: Dict,
+    scanner_options: Dict,
+    baseline: Dict[str, str],
+    early_exit: bool = True,
+) -> Tuple[Dict, Dict]:
+    """Compare a single file with a baseline schema, return drift and metrics."""
+    loader = loaderClass(file_name, **loader_options)
+    with loader as frame:
+        scanner = scannerClass(frame, **scanner_options)
+        drift = scanner.get_drift(baseline, early_exit)
+    return drift, {**loader.metrics, **scanner.metrics}
+
+
+def read_quarantine(file_path: Union[str, os.PathLike]) -> Set[str]:
+    """Get absolute paths of files listed in a quarantine file (if it exists)."""
+    try:
+        with open(file_path, "rt") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+class _Worker:
+    """Worker process of run_workers, with its queues and the tasks handed out to it."""
+
+    def __init__(self, input_queue, output_queue, error_queue):
+        from .transport import SchemaDecoder
+
+        self.process = None
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.error_queue = error_queue
+        self.decoder = SchemaDecoder()
+        # Shared memory blocks are named prefix and a count of them, the
+        # ones not taken yet are known even if their handles are lost
+        self.shared_prefix = f"ds_{secrets.token_hex(4)}_"
+        self.shared_taken = 0
+        # Oldest task is the one being scanned, since started
+        self.tasks = deque()
+        self.started = None
+        # Killed for using too much memory, or taking too long
+        self.out_of_memory = False
+        self.timed_out = False
+
+    def push_task(self, task: Tuple) -> None:
+        if not self.tasks:
+            self.started = time.monotonic()
+        self.tasks.append(task)
+
+    def pop_task(self) -> Tuple:
+        """Forget the oldest task, once it's done."""
+        task = self.tasks.popleft()
+        self.started = time.monotonic()
+        return task
+
+    def take_shared(self, handle: Tuple[str, int]) -> bytes:
+        from .transport import take_shared
+
+        payload = take_shared(handle)
+        self.shared_taken += 1
+        return payload
+
+    def release_shared(self) -> None:
+        """Remove shared memory blocks the worker left behind, once it's gone."""
+        from .transport import unlink_shared
+
+        while unlink_shared(f"{self.shared_prefix}{self.shared_taken}"):
+            self.shared_taken += 1
 
 
 class Processor:
@@ -17,23 +203,107 @@ class Processor:
     Processor is responsible for putting Data Scanner together.
     It's a main entry point to the package. Allows for sequential
     and parallel scan of multiple files.
+
+    Run methods return a list of schemas (in file path order for
+    sequential scans), a single negotiated schema, or with group_by,
+    dict(groups=..., files=...) with a schema negotiated within every
+    group of files (see GroupNegotiator) and a schema of every file.
+    With columns given, only selected columns are scanned: CSV columns
+    by name or (0-based) index, JSON keys by key path prefix.
+    With memory_limit (bytes), workers of run_workers are kept within
+    that much resident memory in total. Files listed in quarantine file
+    (one path per line) are skipped, run_workers adds the files it had
+    to give up on to it. With checkpoint (file path), results are kept
+    as files (and chunks of files) are done, with resume, files done
+    by a previous scan with the same options are not scanned again
+    (see Checkpoint). CSV encoding is detected from the beginning of
+    every file unless given, encoding_errors is a codec error handler
+    (like errors of open) or "fallback" (see decode_fallback).
     """
 
     def __init__(
-        self, paths: Union[str, List[str]], type_: str, negotiate_schema: bool = False
+        self,
+        paths: Union[str, List[str]],
+        type_: str,
+        negotiate_schema: bool = False,
+        nulls: Iterable[str] = DEFAULT_NULLS,
+        booleans: Iterable[str] = DEFAULT_BOOLEANS,
+        case_sensitive: bool = True,
+        header: bool = True,
+        max_malformed_rows: Union[int, None] = 0,
+        sniff_dialect: bool = False,
+        engine: str = "python",
+        max_depth: Union[int, None] = None,
+        max_keys: Union[int, None] = None,
+        ijson_backend: Union[str, None] = None,
+        prefetch: bool = False,
+        prefetch_block_size: int = PREFETCH_BLOCK_SIZE,
+        prefetch_depth: int = PREFETCH_DEPTH,
+        group_by: Union[str, int, None] = None,
+        recursive: bool = False,
+        outlier_threshold: Union[float, None] = None,
+        outlier_sample_size: int = 10,
+        columns: Union[Iterable[Union[str, int]], None] = None,
+        memory_limit: Union[int, None] = None,
+        quarantine: Union[str, os.PathLike, None] = None,
+        checkpoint: Union[str, os.PathLike, None] = None,
+        resume: bool = False,
+        encoding: Union[str, None] = None,
+        encoding_errors: str = "strict",
     ):
-        assert type_ in ("csv", "json"), "Only json or csv files are supported"
+        self.loader, self.scanner = get_engine(type_, engine)
 
+        self.type_ = type_
+        self.engine = engine
         self.negotiate_schema = negotiate_schema
+        self.group_by = group_by
+        self.memory_limit = memory_limit
+        self.quarantine = quarantine
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.loader_options = {}
+        self.scanner_options = dict(
+            nulls=list(nulls), booleans=list(booleans), case_sensitive=case_sensitive
+        )
 
-        self.cores = mp.cpu_count()
+        self.metrics = dict(files={})
+
+        self.cores = os.cpu_count() or 1
 
         if type_ == "csv":
-            self.loader = CSVLoader
-            self.scanner = CSVScanner
-        elif type_ == "json":
-            self.loader = JSONLoader
-            self.scanner = JSONScanner
+            self.loader_options.update(
+                sniff=sniff_dialect, encoding=encoding, errors=encoding_errors
+            )
+            # Arrow engine handles rows while reading batches
+            csv_options = (
+                self.loader_options if engine == "arrow" else self.scanner_options
+            )
+            csv_options.update(header=header, max_malformed_rows=max_malformed_rows)
+            if columns is not None:
+                csv_options.update(columns=list(columns))
+        else:
+            # Fail early if backend is not available
+            get_ijson_backend(ijson_backend)
+            self.loader_options.update(backend=ijson_backend)
+            if engine == "streaming":
+                self.scanner_options.update(max_depth=max_depth, max_keys=max_keys)
+            if columns is not None:
+                self.scanner_options.update(columns=list(columns))
+
+        if outlier_threshold is not None:
+            assert engine == "python", "Outliers are only tolerated by python engine"
+            self.scanner_options.update(
+                outlier_threshold=outlier_threshold,
+                outlier_sample_size=outlier_sample_size,
+            )
+
+        # Arrow reads ahead on its own
+        if prefetch and engine != "arrow":
+            self.loader_options.update(
+                prefetch=prefetch,
+                prefetch_block_size=prefetch_block_size,
+                prefetch_depth=prefetch_depth,
+            )
 
         if isinstance(paths, str):
             paths = [paths]
@@ -42,8 +312,14 @@ class Processor:
         for path in paths:
             if os.path.isfile(path):
                 self.file_list.add(path)
+            elif os.path.isdir(path) and recursive:
+                self.file_list.update(
+                    os.path.join(directory, file_name)
+                    for directory, _, file_names in os.walk(path)
+                    for file_name in file_names
+                )
             elif os.path.isdir(path):
-                self.file_list.union(
+                self.file_list.update(
                     [
                         file_path
                         for file_path in [
@@ -55,121 +331,464 @@ class Processor:
             else:
                 logger.warning(f"Path not found: {path}")
 
+        if quarantine is not None:
+            quarantined = read_quarantine(quarantine)
+            skipped = {
+                file_name
+                for file_name in self.file_list
+                if os.path.abspath(file_name) in quarantined
+            }
+            if skipped:
+                logger.warning(
+                    f"Skipping {len(skipped)} quarantined files (see {quarantine})"
+                )
+                self.file_list -= skipped
+
         if not len(self.file_list) > 0:
             logger.error(f"No files found for path: '{path}'")
 
-    def run_workers(self) -> List[Dict[str, str]]:
+    def run_workers(
+        self,
+        workers: Union[int, None] = None,
+        max_retries: int = 2,
+        task_timeout: Union[float, None] = None,
+    ) -> List[Dict[str, str]]:
         """Scan multiple files in parallel.
 
         This method allows running multiple python processes to scan
         multiple files in parallel. It does not split one file between
         processes, so it won't improve performance for single file datasets.
+        Runs one process per core (but no more than files), unless
+        number of workers is given.
+
+        Every worker gets files through its own bounded queue, so files
+        held by a worker that died are known. A file is scanned again by
+        a new worker if its worker died, ran out of memory (see
+        _check_memory, it's scanned with the engine that needs the least
+        memory then) or did not finish it within task_timeout seconds, up
+        to max_retries times. Then the file is given up and quarantined.
         """
-        input_queue = mp.Queue(maxsize=len(self.file_list) + self.cores)
-        output_queue = mp.Queue(maxsize=len(self.file_list))
-        error_queue = mp.Queue(maxsize=len(self.file_list))
-
-        workers = [
-            mp.Process(
-                target=self._worker_target,
-                args=(
-                    input_queue,
-                    output_queue,
-                    error_queue,
-                    self.loader,
-                    self.scanner,
-                ),
+        # Imported here, multiprocessing is slow to import
+        import multiprocessing as mp
+
+        self.metrics = dict(files={})
+        negotiator = GroupNegotiator(self.group_by)
+        with self._open_checkpoint() as checkpoint:
+            # Tasks are file names, with engine to use if it's not the default one
+            pending = deque()
+            attempts = {}
+            done = set()
+
+            def finish(file_name: str, schema: Dict[str, str]) -> None:
+                done.add(file_name)
+                negotiator.add(file_name, schema)
+
+            for file_name in sorted(self.file_list):
+                if self._resume_file(checkpoint, file_name, negotiator):
+                    done.add(file_name)
+                else:
+                    pending.append((file_name, None))
+
+            workers = min(workers or self.cores, max(len(pending), 1))
+            engine = (
+                self.loader,
+                self.scanner,
+                self.loader_options,
+                self.scanner_options,
             )
-            for _ in range(self.cores)
-        ]
+            # Within memory limit, files are handed out one at a time, so that
+            # workers don't start scanning new ones while dispatch is paused
+            queue_size = 1 if self.memory_limit is not None else _WORKER_QUEUE_SIZE
 
-        # Queue all the tasks
-        for file_name in self.file_list:
-            input_queue.put(file_name)
+            pool = {}
+            worker_ids = itertools.count()
 
-        # Queue end messages
-        for _ in range(self.cores):
-            input_queue.put(None)
+            def start_worker() -> None:
+                worker_id = next(worker_ids)
+                # Queues are not shared, a worker killed while writing
+                # to its queue can't break the ones of other workers
+                worker = _Worker(
+                    mp.Queue(maxsize=queue_size),
+                    mp.Queue(maxsize=_WORKER_QUEUE_SIZE),
+                    mp.Queue(maxsize=_WORKER_QUEUE_SIZE),
+                )
+                worker.process = mp.Process(
+                    target=self._worker_target,
+                    args=(
+                        worker.input_queue,
+                        worker.output_queue,
+                        worker.error_queue,
+                        *engine,
+                        worker_id,
+                        worker.shared_prefix,
+                    ),
+                )
+                worker.process.start()
+                pool[worker_id] = worker
 
-        # Run workers
-        for process in workers:
-            process.start()
+            def lost(task: Tuple, reason: str, low_memory: bool = False) -> None:
+                file_name, task_engine = task
+                attempts[file_name] = attempts.get(file_name, 0) + 1
+                if attempts[file_name] > max_retries:
+                    logger.error(
+                        f"Giving up on file {os.path.basename(file_name)} after "
+                        f"{attempts[file_name]} attempts ({reason}), quarantining it"
+                    )
+                    self._quarantine_file(file_name)
+                    finish(file_name, {})
+                    return
+                logger.warning(
+                    f"Failed to scan file {os.path.basename(file_name)} ({reason}), "
+                    + (
+                        "queuing it again with less memory"
+                        if low_memory
+                        else "queuing it again"
+                    )
+                )
+                if low_memory:
+                    task_engine = self._get_low_memory_engine()
+                pending.appendleft((file_name, task_engine))
 
-        # Wait for results
-        schemas = []
-        while True:
-            if not workers:
-                break
+            for _ in range(workers):
+                start_worker()
+
+            # Wait for results
+            closing = False
+            while pool:
+                for worker in pool.values():
+                    if worker.timed_out or worker.out_of_memory:
+                        # Killed, possibly halfway through writing to a queue
+                        continue
+
+                    # Empty output queue
+                    try:
+                        while True:
+                            out = worker.output_queue.get_nowait()
+                            worker.pop_task()
+                            schema = out["schema"]
+                            if schema is None:
+                                encoded = out["encoded"]
+                                if encoded is None:
+                                    encoded = worker.take_shared(out["shared"])
+                                schema = worker.decoder.decode(encoded)
+                            metrics = out["metrics"]
+                            if out["file_name"] in attempts:
+                                metrics = dict(metrics, retried=True)
+                            self._collect_metrics(out["file_name"], metrics)
+                            if checkpoint is not None:
+                                checkpoint.add_file(out["file_name"], schema, metrics)
+                            finish(out["file_name"], schema)
+                    except queue.Empty:
+                        pass
 
-            # Health check
-            _workers = []
-            for process in workers:
-                if not process.is_alive():
+                    # Empty error_queue
+                    try:
+                        while True:
+                            err = worker.error_queue.get_nowait()
+                            task = worker.pop_task()
+                            exception = err.get("exception")
+                            if isinstance(exception, MemoryError):
+                                lost(task, "MemoryError", low_memory=True)
+                                continue
+                            self._log_error(err.get("file_name"), exception)
+                            finish(err.get("file_name"), {})
+                    except queue.Empty:
+                        pass
+
+                # Health check
+                self._check_timeouts(pool, task_timeout)
+                for worker_id, worker in list(pool.items()):
+                    process = worker.process
+                    if process.is_alive():
+                        continue
+                    del pool[worker_id]
+                    # Its queues are dropped, with handles of blocks not taken yet
+                    worker.release_shared()
                     if process.exitcode != 0:
                         logger.error(
                             f"Process {process.name} exited with code {process.exitcode}"
                         )
-                else:
-                    _workers.append(process)
-            workers = _workers
+                    if not worker.tasks:
+                        continue
+                    # Oldest task was being scanned, the rest are handed out again
+                    task = worker.tasks.popleft()
+                    pending.extendleft(reversed(worker.tasks))
+                    if worker.timed_out:
+                        lost(task, f"timed out after {task_timeout}s")
+                    elif worker.out_of_memory or process.exitcode == _OOM_EXIT_CODE:
+                        lost(task, "out of memory", low_memory=True)
+                    else:
+                        lost(task, f"process exited with code {process.exitcode}")
 
-            # Empty output queue
-            try:
-                while True:
-                    out = output_queue.get_nowait()
-                    schemas.append(out)
-            except queue.Empty as e:
-                pass
+                if not closing:
+                    # Replace workers that died, if there is anything left to scan
+                    while pending and len(pool) < workers:
+                        start_worker()
+                    self._dispatch(pool, pending, queue_size, self._check_memory(pool))
 
-            # Empty error_queue
-            try:
-                while True:
-                    err = error_queue.get_nowait()
-                    file_name = err.get("file_name")
-                    exception = err.get("exception")
-                    logger.error(
-                        f"Error scanning file {os.path.basename(file_name)}: {exception}"
-                    )
-                    logger.debug(
-                        f"Exception traceback:\n{(traceback_format(exception))}"
-                        if len(traceback_format(exception)) > 0
-                        else "No exception traceback"
-                    )
-                    schemas.append({})
-            except queue.Empty:
-                pass
+                    if not pending and len(done) == len(self.file_list):
+                        closing = True
+                        for worker in pool.values():
+                            worker.input_queue.put(None)
 
-            # Wait
-            time.sleep(0.5)
+                # Wait
+                time.sleep(_POLL_INTERVAL)
 
-        if self.negotiate_schema:
-            return Negotiator.negotiate(schemas)
-        return schemas
+        return self._get_result(negotiator)
+
+    @staticmethod
+    def _dispatch(
+        pool: Dict[int, "_Worker"], pending: deque, queue_size: int, paused: bool
+    ) -> None:
+        """Hand out pending tasks to workers with the fewest of them.
+
+        While paused, a task is only handed out if no worker has any,
+        so that the scan goes on.
+        """
+        while pending and pool:
+            worker = min(pool.values(), key=lambda worker: len(worker.tasks))
+            if len(worker.tasks) >= queue_size:
+                break
+            if paused and any(busy.tasks for busy in pool.values()):
+                break
+            task = pending.popleft()
+            worker.push_task(task)
+            worker.input_queue.put_nowait(task)
+
+    @staticmethod
+    def _check_timeouts(
+        pool: Dict[int, "_Worker"], task_timeout: Union[float, None]
+    ) -> None:
+        """Kill workers scanning a file for longer than task_timeout."""
+        if task_timeout is None:
+            return
+        now = time.monotonic()
+        for worker in pool.values():
+            if (
+                worker.tasks
+                and not worker.timed_out
+                and now - worker.started > task_timeout
+            ):
+                logger.warning(
+                    f"Process {worker.process.name} is scanning file "
+                    f"{os.path.basename(worker.tasks[0][0])} for over "
+                    f"{task_timeout}s, stopping it"
+                )
+                worker.timed_out = True
+                worker.process.kill()
+
+    def _check_memory(self, pool: Dict[int, "_Worker"]) -> bool:
+        """Check resident memory of workers against memory_limit.
+
+        Returns True if workers use more than memory_limit in total,
+        then no more tasks should be handed out. A worker that alone
+        uses more than memory_limit is killed. Peak memory use
+        is kept in metrics.
+        """
+        if self.memory_limit is None:
+            return False
+
+        total = 0
+        for worker in pool.values():
+            rss = get_rss(worker.process.pid)
+            if rss is None:
+                continue
+            total += rss
+            if rss > self.memory_limit and worker.tasks and not worker.out_of_memory:
+                logger.warning(
+                    f"Process {worker.process.name} uses {rss} bytes of memory, "
+                    f"over the limit of {self.memory_limit}, stopping it"
+                )
+                worker.out_of_memory = True
+                worker.process.kill()
+        self.metrics["peak_memory"] = max(self.metrics.get("peak_memory", 0), total)
+        return total > self.memory_limit
+
+    def _get_low_memory_engine(self) -> Tuple:
+        """Get loader and scanner classes (with options) using the least memory.
+
+        Streaming engine never builds JSON records (unless outliers are
+        tolerated, which only python engine does), python engine never
+        reads CSV files at once, like arrow does.
+        """
+        if (
+            self.type_ == "json"
+            and self.engine == "python"
+            and "outlier_threshold" not in self.scanner_options
+        ):
+            return (
+                JSONEventLoader,
+                JSONEventScanner,
+                self.loader_options,
+                self.scanner_options,
+            )
+        if self.engine == "arrow":
+            loader_options = dict(self.loader_options)
+            scanner_options = dict(self.scanner_options)
+            # Arrow loader handles rows, python engine does it in scanner
+            for name in ("header", "max_malformed_rows", "columns"):
+                if name in loader_options:
+                    scanner_options[name] = loader_options.pop(name)
+            return CSVLoader, CSVScanner, loader_options, scanner_options
+        return self.loader, self.scanner, self.loader_options, self.scanner_options
 
     @staticmethod
     def _worker_target(
-        input_queue: mp.Queue,
-        output_queue: mp.Queue,
-        error_queue: mp.Queue,
+        input_queue: "multiprocessing.Queue",
+        output_queue: "multiprocessing.Queue",
+        error_queue: "multiprocessing.Queue",
         loaderClass: Union[CSVLoader, JSONLoader],
         scannerClass: Union[CSVScanner, JSONScanner],
+        loader_options: Dict,
+        scanner_options: Dict,
+        worker_id: int = 0,
+        shared_prefix: Union[str, None] = None,
     ) -> None:
         """Worker  routine.
 
         Scans files passed through input_queue and pushes
         schemas into output_queue. If fails to scan - an exception
-        will be pushed into error_queue.
+        will be pushed into error_queue. Schemas are encoded (see
+        SchemaEncoder), big ones are passed through shared memory
+        and only a handle to it is pushed into output_queue. With
+        shared_prefix, blocks are named after it, numbered in order
+        (see _Worker.release_shared).
+        Tasks can come with their own engine (loader and scanner
+        classes with options), to be used instead of the default one.
         """
+        from .transport import SHARED_MEMORY_MIN_SIZE, SchemaEncoder, put_shared
+
+        encoder = SchemaEncoder()
+        shared_count = 0
         while True:
-            file_name = input_queue.get()
-            if file_name is None:
+            task = input_queue.get()
+            if task is None:
                 break
+            file_name, engine = task
             try:
-                with loaderClass(file_name) as loader:
-                    schema = scannerClass(loader).get_schema()
-                output_queue.put(schema)
+                schema, metrics = scan_file(
+                    file_name,
+                    *(
+                        engine
+                        or (loaderClass, scannerClass, loader_options, scanner_options)
+                    ),
+                )
+                encoded, shared = encoder.encode(schema), None
+                if encoded is not None and len(encoded) >= SHARED_MEMORY_MIN_SIZE:
+                    try:
+                        encoded, shared = None, put_shared(
+                            encoded,
+                            shared_prefix and f"{shared_prefix}{shared_count}",
+                        )
+                        shared_count += 1
+                    except OSError:
+                        # Names are already interned, payload has to be sent anyway
+                        pass
+                output_queue.put(
+                    dict(
+                        file_name=file_name,
+                        worker_id=worker_id,
+                        # Schema itself is only sent if it can't be encoded
+                        schema=schema if encoded is None and shared is None else None,
+                        encoded=encoded,
+                        shared=shared,
+                        metrics=metrics,
+                    )
+                )
             except Exception as e:
-                error_queue.put(dict(file_name=file_name, exception=e))
+                error_queue.put(
+                    dict(file_name=file_name, worker_id=worker_id, exception=e)
+                )
+
+    def _open_checkpoint(self) -> Union[Checkpoint, nullcontext]:
+        """Open checkpoint of a scan, context gives None if it's not kept."""
+        if self.checkpoint is None:
+            return nullcontext()
+        options = dict(
+            type_=self.type_,
+            engine=self.engine,
+            loader_options=self.loader_options,
+            scanner_options=self.scanner_options,
+        )
+        return Checkpoint(self.checkpoint, options, resume=self.resume)
+
+    def _resume_file(
+        self,
+        checkpoint: Union[Checkpoint, None],
+        file_name: str,
+        negotiator: GroupNegotiator,
+    ) -> bool:
+        """Take schema of a file done before from checkpoint, if there is one.
+
+        Otherwise the file is about to be scanned, see Checkpoint.start_file.
+        """
+        if checkpoint is None:
+            return False
+        result = checkpoint.get_file(file_name)
+        if result is None:
+            checkpoint.start_file(file_name)
+            return False
+        schema, metrics = result
+        self._collect_metrics(file_name, dict(metrics, resumed=True))
+        negotiator.add(file_name, schema)
+        return True
+
+    def _quarantine_file(self, file_name: str) -> None:
+        """Keep a file that could not be scanned out of future scans."""
+        self.metrics.setdefault("quarantined", []).append(file_name)
+        if self.quarantine is not None:
+            with open(self.quarantine, "at") as f:
+                f.write(os.path.abspath(file_name) + "\n")
+
+    @staticmethod
+    def _log_error(file_name: str, exception: Exception) -> None:
+        logger.error(f"Error scanning file {os.path.basename(file_name)}: {exception}")
+        logger.debug(
+            f"Exception traceback:\n{(traceback_format(exception))}"
+            if len(traceback_format(exception)) > 0
+            else "No exception traceback"
+        )
+
+    def _collect_metrics(self, file_name: str, metrics: Dict) -> None:
+        """Keep metrics reported for a single file."""
+        self.metrics["files"][file_name] = metrics
+
+        malformed_rows = metrics.get("malformed_rows")
+        if malformed_rows:
+            lines = ", ".join(map(str, metrics["malformed_sample"]))
+            logger.warning(
+                f"Skipped {malformed_rows} malformed rows in file "
+                f"{os.path.basename(file_name)} (first at lines: {lines})"
+            )
+
+        skipped_values = metrics.get("skipped_values")
+        if skipped_values:
+            logger.warning(
+                f"Skipped {skipped_values} values over the key limit "
+                f"in file {os.path.basename(file_name)}"
+            )
+
+        outliers = metrics.get("outliers")
+        if outliers:
+            columns = ", ".join(
+                f"{name} ({column['count']})" for name, column in outliers.items()
+            )
+            logger.warning(
+                f"Outliers tolerated in file {os.path.basename(file_name)}: {columns}"
+            )
+
+    def _get_result(
+        self, negotiator: GroupNegotiator
+    ) -> Union[List[Dict[str, str]], Dict]:
+        """Get schemas in the form asked for (see Processor)."""
+        if self.group_by is not None:
+            return dict(
+                groups=dict(sorted(negotiator.groups.items())),
+                files=dict(sorted(negotiator.files.items())),
+            )
+        if self.negotiate_schema:
+            return negotiator.groups.get("", {})
+        return list(negotiator.files.values())
 
     def run(self) -> List[Dict[str, str]]:
         """Run sequential scan over a list of files.
@@ -178,23 +797,387 @@ class Processor:
         os spawning multiple processes, it's better for smaller
         datasets.
         """
-        schemas = []
-        for file_name in self.file_list:
+        self.metrics = dict(files={})
+        negotiator = GroupNegotiator(self.group_by)
+        with self._open_checkpoint() as checkpoint:
+            for file_name in sorted(self.file_list):
+                if self._resume_file(checkpoint, file_name, negotiator):
+                    continue
+                try:
+                    schema, metrics = scan_file(
+                        file_name,
+                        self.loader,
+                        self.scanner,
+                        self.loader_options,
+                        self.scanner_options,
+                    )
+                    self._collect_metrics(file_name, metrics)
+                    negotiator.add(file_name, schema)
+                except Exception as exception:
+                    self._log_error(file_name, exception)
+                    negotiator.add(file_name, {})
+                    continue
+                if checkpoint is not None:
+                    checkpoint.add_file(file_name, schema, metrics)
+
+        return self._get_result(negotiator)
+
+    def check_drift(
+        self, baseline: Dict[str, str], early_exit: bool = True
+    ) -> Dict[str, Dict]:
+        """Compare every file with a baseline schema, return drift by file path.
+
+        Drift lists columns that changed type (widened beyond the
+        baseline type, see Negotiator), were added or removed. With
+        early_exit, scan of a file stops at its first drifting column,
+        so files without drift are the only ones scanned to the end.
+        """
+        self.metrics = dict(files={})
+        drifts = {}
+        for file_name in sorted(self.file_list):
             try:
-                with self.loader(file_name) as loader:
-                    schema = self.scanner(loader).get_schema()
-                schemas.append(schema)
+                drift, metrics = scan_file_drift(
+                    file_name,
+                    self.loader,
+                    self.scanner,
+                    self.loader_options,
+                    self.scanner_options,
+                    baseline,
+                    early_exit,
+                )
+                self._collect_metrics(file_name, metrics)
             except Exception as exception:
-                logger.error(
-                    f"Error scanning file {os.path.basename(file_name)}: {exception}"
+                self._log_error(file_name, exception)
+                drifts[file_name] = {}
+                continue
+
+            drifts[file_name] = drift
+            if drift["changed"] or drift["added"] or drift["removed"]:
+                logger.warning(
+                    f"Schema drift in file {os.path.basename(file_name)}: "
+                    f"changed {sorted(drift['changed'])}, added {sorted(drift['added'])}, "
+                    f"removed {drift['removed']}"
                 )
-                logger.debug(
-                    f"Exception traceback:\n{(traceback_format(exception))}"
-                    if len(traceback_format(exception)) > 0
-                    else "No exception traceback"
+
+        return drifts
+
+    def run_threads(self, workers: Union[int, None] = None) -> List[Dict[str, str]]:
+        """Scan multiple files in a pool of threads.
+
+        Threads share the GIL, so it only pays off if most of the time
+        is spent outside of python, like reading files with arrow engine.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.metrics = dict(files={})
+        negotiator = GroupNegotiator(self.group_by)
+        with self._open_checkpoint() as checkpoint, ThreadPoolExecutor(
+            max_workers=workers or self.cores
+        ) as pool:
+            file_list = [
+                file_name
+                for file_name in sorted(self.file_list)
+                if not self._resume_file(checkpoint, file_name, negotiator)
+            ]
+            futures = [
+                pool.submit(
+                    scan_file,
+                    file_name,
+                    self.loader,
+                    self.scanner,
+                    self.loader_options,
+                    self.scanner_options,
                 )
-                schemas.append({})
+                for file_name in file_list
+            ]
+            for file_name, future in zip(file_list, futures):
+                try:
+                    schema, metrics = future.result()
+                    self._collect_metrics(file_name, metrics)
+                    negotiator.add(file_name, schema)
+                except Exception as exception:
+                    self._log_error(file_name, exception)
+                    negotiator.add(file_name, {})
+                    continue
+                if checkpoint is not None:
+                    checkpoint.add_file(file_name, schema, metrics)
 
-        if self.negotiate_schema:
-            return Negotiator.negotiate(schemas)
-        return schemas
+        return self._get_result(negotiator)
+
+    def _can_split(
+        self, file_name: str, min_chunk_size: Union[int, None] = None
+    ) -> bool:
+        """Check if a file can be split into chunks scanned in parallel."""
+        if self.type_ != "csv" or self.engine != "python":
+            return False
+        # Limit of malformed rows (and their line numbers) is kept per file
+        if self.scanner_options.get("max_malformed_rows") != 0:
+            return False
+        # Outliers are counted over a whole file
+        if self.scanner_options.get("outlier_threshold") is not None:
+            return False
+        # Without a header, first row of a file defines number of columns
+        if not self.scanner_options.get("header", True):
+            return False
+        # Quotes and newlines are searched for as single bytes
+        encoding = self.loader_options.get("encoding") or sniff_encoding(file_name)
+        if not is_ascii_compatible(encoding):
+            return False
+        return os.path.getsize(file_name) >= 2 * (min_chunk_size or _MIN_CHUNK_SIZE)
+
+    def _get_chunks(
+        self,
+        file_name: str,
+        workers: int,
+        min_chunk_size: Union[int, None] = None,
+        checkpoint: Union[Checkpoint, None] = None,
+    ) -> List[Dict]:
+        """Get loader options for every chunk of a file.
+
+        File is split the way it was before, if checkpoint has it,
+        so that chunks done then can be reused.
+        """
+        byte_ranges = (
+            checkpoint.get_split(file_name) if checkpoint is not None else None
+        )
+        if byte_ranges is None:
+            min_chunk_size = min_chunk_size or _MIN_CHUNK_SIZE
+            n_chunks = min(workers, os.path.getsize(file_name) // min_chunk_size)
+            if n_chunks < 2 or not self._can_split(file_name, min_chunk_size):
+                return [self.loader_options]
+
+            quotechar = '"'
+            if self.loader_options.get("sniff"):
+                _, dialect = sniff_dialect(file_name)
+                quotechar = dialect.get("quotechar", quotechar)
+
+            byte_ranges = split_csv(file_name, n_chunks, quotechar)
+            if checkpoint is not None:
+                checkpoint.add_split(file_name, byte_ranges)
+
+        return [
+            dict(self.loader_options, byte_range=byte_range)
+            for byte_range in byte_ranges
+        ]
+
+    def run_chunks(
+        self,
+        workers: Union[int, None] = None,
+        min_chunk_size: Union[int, None] = None,
+    ) -> List[Dict[str, str]]:
+        """Scan files in a pool of processes, splitting big files into chunks.
+
+        Big CSV files are split into chunks of full rows, scanned in
+        parallel and their states are merged (see SchemaState), so
+        it helps even with a single file dataset. Other files are
+        scanned whole, just like by run (tolerating outliers too).
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        workers = workers or self.cores
+        file_list = sorted(self.file_list)
+
+        # Chunk states (with metrics) in file order, until files are done
+        chunks = {}
+        resumed_chunks = {}
+        # Schemas (with metrics) of files done
+        results = {}
+
+        def merge(file_name: str) -> None:
+            states, metrics = zip(*chunks.pop(file_name))
+            file_metrics = dict(metrics[0], chunks=len(states))
+            if "io_wait" in file_metrics:
+                file_metrics["io_wait"] = sum(chunk["io_wait"] for chunk in metrics)
+            if resumed_chunks.get(file_name):
+                file_metrics["resumed_chunks"] = resumed_chunks[file_name]
+            schema = SchemaState.merge_all(states).get_schema()
+            if checkpoint is not None:
+                checkpoint.add_file(file_name, schema, file_metrics)
+            results[file_name] = (schema, file_metrics)
+
+        with self._open_checkpoint() as checkpoint, ProcessPoolExecutor(
+            max_workers=workers
+        ) as pool:
+            futures = {}
+            for file_name in file_list:
+                resumed = (
+                    checkpoint.get_file(file_name) if checkpoint is not None else None
+                )
+                if resumed is not None:
+                    schema, metrics = resumed
+                    results[file_name] = (schema, dict(metrics, resumed=True))
+                    continue
+                if checkpoint is not None:
+                    checkpoint.start_file(file_name)
+
+                file_chunks = self._get_chunks(
+                    file_name, workers, min_chunk_size, checkpoint
+                )
+                if "byte_range" not in file_chunks[0]:
+                    future = pool.submit(
+                        scan_file,
+                        file_name,
+                        self.loader,
+                        self.scanner,
+                        self.loader_options,
+                        self.scanner_options,
+                    )
+                    futures[future] = (file_name, None, None)
+                    continue
+                chunks[file_name] = [None] * len(file_chunks)
+                for idx, loader_options in enumerate(file_chunks):
+                    byte_range = loader_options.get("byte_range")
+                    if checkpoint is not None and byte_range is not None:
+                        chunk = checkpoint.get_chunk(file_name, byte_range)
+                        if chunk is not None:
+                            chunks[file_name][idx] = chunk
+                            resumed_chunks[file_name] = (
+                                resumed_chunks.get(file_name, 0) + 1
+                            )
+                            continue
+                    future = pool.submit(
+                        scan_file_state,
+                        file_name,
+                        self.loader,
+                        self.scanner,
+                        loader_options,
+                        self.scanner_options,
+                    )
+                    futures[future] = (file_name, idx, byte_range)
+                if all(chunks[file_name]):
+                    merge(file_name)
+
+            for future in as_completed(futures):
+                file_name, idx, byte_range = futures[future]
+                if idx is None:
+                    # Whole file
+                    try:
+                        schema, metrics = future.result()
+                    except Exception as exception:
+                        self._log_error(file_name, exception)
+                        continue
+                    metrics = dict(metrics, chunks=1)
+                    if checkpoint is not None:
+                        checkpoint.add_file(file_name, schema, metrics)
+                    results[file_name] = (schema, metrics)
+                    continue
+                if file_name not in chunks:
+                    # Another chunk of the file failed
+                    continue
+                try:
+                    state, metrics = future.result()
+                except Exception as exception:
+                    self._log_error(file_name, exception)
+                    del chunks[file_name]
+                    continue
+                chunks[file_name][idx] = (state, metrics)
+                if checkpoint is not None and byte_range is not None:
+                    checkpoint.add_chunk(file_name, byte_range, state, metrics)
+                if all(chunks[file_name]):
+                    merge(file_name)
+
+        self.metrics = dict(files={})
+        negotiator = GroupNegotiator(self.group_by)
+        for file_name in file_list:
+            if file_name not in results:
+                negotiator.add(file_name, {})
+                continue
+            schema, metrics = results[file_name]
+            self._collect_metrics(file_name, metrics)
+            negotiator.add(file_name, schema)
+
+        return self._get_result(negotiator)
+
+    def plan(self, workers: Union[int, None] = None) -> str:
+        """Choose how to run a scan, based on number and size of files.
+
+        Returns "sequential", "threads", "processes" or "chunks",
+        see run_auto.
+        """
+        workers = workers or self.cores
+        sizes = [os.path.getsize(file_name) for file_name in self.file_list]
+        total_size = sum(sizes)
+        estimate = total_size / _SCAN_RATES[(self.type_, self.engine)]
+
+        if workers < 2 or len(sizes) == 0 or estimate < 2 * _PROCESS_OVERHEAD:
+            # Not worth starting processes
+            mode = "sequential"
+        elif self.engine == "arrow":
+            # Files are parsed by multithreaded pyarrow, outside of GIL
+            mode = "threads" if len(sizes) > 1 else "sequential"
+        elif max(sizes) > total_size / workers and any(
+            self._can_split(file_name) for file_name in self.file_list
+        ):
+            # Biggest file would keep one process busy long after the rest
+            mode = "chunks"
+        else:
+            mode = "processes"
+
+        logger.info(
+            f"Running {mode} scan of {len(sizes)} files ({total_size} bytes, "
+            f"~{estimate:.1f}s estimated for a single process, {workers} workers)"
+        )
+        return mode
+
+    def run_auto(
+        self,
+        workers: Union[int, None] = None,
+        max_retries: int = 2,
+        task_timeout: Union[float, None] = None,
+    ) -> List[Dict[str, str]]:
+        """Scan files the way that should be the fastest for the dataset.
+
+        Small datasets are scanned sequentially (see run), since starting
+        processes would take longer than the scan itself. Otherwise files
+        are scanned in a pool of threads (arrow engine), processes (see
+        run_workers), or processes with big files split into chunks (see
+        run_chunks) if a single file would dominate the scan.
+        Retries and timeouts only apply to processes.
+        """
+        mode = self.plan(workers)
+        if mode == "threads":
+            return self.run_threads(workers)
+        if mode == "processes":
+            return self.run_workers(workers, max_retries, task_timeout)
+        if mode == "chunks":
+            return self.run_chunks(workers)
+        return self.run()
+
+    def run_coordinator(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8765,
+        max_retries: int = 2,
+        task_timeout: Union[float, None] = None,
+    ) -> List[Dict[str, str]]:
+        """Run distributed scan over workers on multiple hosts.
+
+        Starts a coordinator that hands files out to workers connected
+        over TCP (started with `python -m data_scanner.distributed`),
+        files must be available under the same paths on every host.
+        Files held by lost workers are retried up to max_retries times.
+        """
+        # Imported here, since distributed workers depend on this module
+        from .distributed import Coordinator
+
+        coordinator = Coordinator(
+            self.file_list,
+            self.type_,
+            engine=self.engine,
+            loader_options=self.loader_options,
+            scanner_options=self.scanner_options,
+            host=host,
+            port=port,
+            max_retries=max_retries,
+            task_timeout=task_timeout,
+        )
+        results = coordinator.run()
+
+        self.metrics = dict(files={})
+        for file_name, metrics in coordinator.metrics.items():
+            self._collect_metrics(file_name, metrics)
+        negotiator = GroupNegotiator(self.group_by)
+        for file_name, schema in results.items():
+            negotiator.add(file_name, schema)
+
+        return self._get_result(negotiator)
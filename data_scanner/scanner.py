@@ -1,21 +1,175 @@
 import re
 from decimal import Decimal  # ijson uses decimal
-from typing import Dict, Union, Iterable, Any
+from itertools import islice
+from typing import (
+    Dict,
+    List,
+    Union,
+    Iterable,
+    Iterator,
+    Any,
+    Tuple,
+    Container,
+    Sequence,
+)
 import abc
 
 import ujson
 import pendulum
 
+from .state import TYPES, ColumnState, SchemaState
+from .negotiator import Negotiator, DriftDetector
+from .loader import resolve_columns, get_projection, match_key_path
+
+_SATURATED = ("string",) * len(TYPES)
+
+# Types a column can get despite outliers, narrowest first
+_CANDIDATE_TYPES = ("integer", "float", "boolean", "date", "timestamp", "json")
+
+# Candidate types values of a type fit in, by negotiation rules
+_COMPATIBLE_TYPES = {
+    dtype: frozenset(
+        candidate
+        for candidate in _CANDIDATE_TYPES
+        if dtype in Negotiator.get_allowed_types(candidate)
+    )
+    for dtype in TYPES
+}
+
+_JSON_BRACKETS = {"{": "}", "[": "]"}
+
+# Number of rows CSV columns are checked in at once
+_BLOCK_SIZE = 1024
+
+# Pendulum only parses ISO 8601 strings (and "now"), which
+# start with a digit or a time designator
+_DATE_FIRST_CHARS = frozenset("0123456789T")
+
+
+def _is_date_candidate(value: str) -> bool:
+    return value[:1] in _DATE_FIRST_CHARS or value == "now"
+
+
+DEFAULT_NULLS = ("", "NULL", "Null", "null", "None", "none", "NA", "N/A")
+DEFAULT_BOOLEANS = ("True", "False", "true", "false", "t", "f", "T", "F", "1", "0")
+
+
+class CaseInsensitiveVocabulary:
+    """Set of strings compared regardless of case.
+
+    Values are casefolded into a frozenset, so lookup cost doesn't depend
+    on the vocabulary size. Casefolding never shortens a string, so values
+    longer than the longest entry are rejected without casefolding them.
+    """
+
+    def __init__(self, values: Iterable[str]):
+        self.values = frozenset(value.casefold() for value in values)
+        self._max_length = max(map(len, self.values), default=-1)
+
+    def __contains__(self, value: str) -> bool:
+        return len(value) <= self._max_length and value.casefold() in self.values
+
+
+def compile_vocabulary(
+    values: Iterable[str], case_sensitive: bool = True
+) -> Container[str]:
+    """Compile values recognized as nulls/booleans into a lookup structure."""
+    if case_sensitive:
+        return frozenset(values)
+    return CaseInsensitiveVocabulary(values)
+
+
+class TypeCounter:
+    """Counts non-null values of a column by their type.
+
+    Column gets the candidate type with the fewest values that don't
+    fit in it (outliers), as long as they are no more than threshold
+    (a fraction) of all the values, otherwise it's a string. Up to
+    sample_size values of every type are kept with their positions,
+    so outliers can be shown whatever the final type is.
+    """
+
+    __slots__ = ("counts", "samples", "sample_size", "last")
+
+    def __init__(self, sample_size: int = 10):
+        self.counts = {}
+        self.samples = {}
+        self.sample_size = sample_size
+        # Type of the last value added
+        self.last = None
+
+    def add(self, dtype: str, is_boolean: bool, value: Any, position: int) -> None:
+        # Numbers can also be booleans (like 0 and 1)
+        key = self.last = (dtype, is_boolean)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        if count < self.sample_size:
+            self.samples.setdefault(key, []).append((position, value))
+
+    def _get_outliers(self, candidate: str) -> List[Tuple[str, bool]]:
+        return [
+            key
+            for key in self.counts
+            if candidate not in _COMPATIBLE_TYPES[key[0]]
+            and not (key[1] and candidate == "boolean")
+        ]
+
+    def get_type(self, threshold: float) -> Tuple[str, int]:
+        """Get type of the column and number of outliers."""
+        total = sum(self.counts.values())
+        if total == 0:
+            return "unknown", 0
+
+        best, best_outliers = "string", total
+        for candidate in _CANDIDATE_TYPES:
+            outliers = sum(self.counts[key] for key in self._get_outliers(candidate))
+            if outliers < best_outliers:
+                best, best_outliers = candidate, outliers
+        if best_outliers > threshold * total:
+            return "string", 0
+        return best, best_outliers
+
+    def get_report(self, dtype: str) -> Dict:
+        """Get counts by type and a sample of outliers (by position) for a type."""
+        counts = {}
+        for (value_type, _), count in self.counts.items():
+            counts[value_type] = counts.get(value_type, 0) + count
+        keys = self._get_outliers(dtype) if dtype in _CANDIDATE_TYPES else []
+        sample = sorted(
+            (sample for key in keys for sample in self.samples[key]),
+            key=lambda sample: sample[0],
+        )[: self.sample_size]
+        return dict(
+            counts=counts,
+            sample=[dict(position=position, value=value) for position, value in sample],
+        )
+
 
 class Scanner(abc.ABC):
     """Template for scanner subclasses.
 
     Scanners should iterate through records and create a schema
-    based on the data those records contain.
+    based on the data those records contain. With columns given,
+    only selected columns are typed (others are left out of schemas).
     """
 
-    def __init__(self, frame: Iterable):
+    def __init__(
+        self,
+        frame: Iterable,
+        nulls: Iterable[str] = DEFAULT_NULLS,
+        booleans: Iterable[str] = DEFAULT_BOOLEANS,
+        case_sensitive: bool = True,
+        outlier_threshold: Union[float, None] = None,
+        outlier_sample_size: int = 10,
+        columns: Union[List[Union[str, int]], None] = None,
+    ):
         self.frame = frame
+        self.metrics = {}
+        self._nulls = compile_vocabulary(nulls, case_sensitive)
+        self._booleans = compile_vocabulary(booleans, case_sensitive)
+        self.outlier_threshold = outlier_threshold
+        self.outlier_sample_size = outlier_sample_size
+        self.columns = columns
 
     @abc.abstractmethod
     def _is_null(self, value):
@@ -51,30 +205,120 @@ class Scanner(abc.ABC):
         """Entry point for scanner. Uses _get_dtype to scan an iterable (self.frame)."""
         pass
 
+    @abc.abstractmethod
+    def get_state(self) -> SchemaState:
+        """Like get_schema, but returns a mergeable state instead of final types."""
+        pass
+
+    @abc.abstractmethod
+    def get_drift(self, baseline: Dict[str, str], early_exit: bool = True) -> Dict:
+        """Compare types with a baseline schema (see DriftDetector).
+
+        With early_exit, scan stops at the first drifting column.
+        """
+        pass
+
+    def _count_value(self, counter: TypeCounter, value: Any, position: int) -> None:
+        """Count a non-null value by its type (see TypeCounter)."""
+        dtype = self._get_dtype(value)
+        counter.add(
+            dtype,
+            dtype in ("integer", "float") and self._is_boolean(value),
+            value,
+            position,
+        )
+
+    def _get_tolerant_schema(self, counters: Dict[str, TypeCounter]) -> Dict:
+        """Get types allowing for outliers, which are reported in metrics."""
+        schema, outliers = {}, {}
+        for name, counter in counters.items():
+            dtype, count = counter.get_type(self.outlier_threshold)
+            schema[name] = dtype
+            if count > 0:
+                outliers[name] = dict(
+                    type=dtype, count=count, **counter.get_report(dtype)
+                )
+        self.metrics["outliers"] = outliers
+        return schema
+
+    def _get_transitions(self, value: Any, transitions: Tuple[str, ...]) -> Tuple:
+        """Resolve a value for every starting type of a column state.
+
+        Nulls never change the type, so they are skipped. Distinct
+        current types are resolved once, since starting types usually
+        converge after the first few values.
+        """
+        if transitions == _SATURATED or self._is_null(value):
+            return transitions
+
+        resolved = {}
+        result = []
+        for dtype in transitions:
+            if dtype not in resolved:
+                resolved[dtype] = self._get_dtype(value, dtype)
+            result.append(resolved[dtype])
+        return tuple(result)
+
 
 class CSVScanner(Scanner):
-    """Allows to iterate over a frame (created by CSVLoader) and generate a schema."""
+    """Allows to iterate over a frame (created by CSVLoader) and generate a schema.
 
-    def __init__(self, frame: Iterable):
-        self.frame = frame
-        self._nulls = ["", "NULL", "Null", "null", "None", "none", "NA", "N/A"]
-        self._booleans = [
-            "True",
-            "False",
-            "true",
-            "false",
-            "t",
-            "f",
-            "T",
-            "F",
-            "1",
-            "0",
-        ]
+    Without a header, columns are named by position (column_1, column_2, ...).
+    Up to max_malformed_rows rows with invalid number of columns are skipped
+    (None for no limit), exceeding the limit fails the scan.
+    Columns are selected by name or (0-based) index, see resolve_columns.
+    """
+
+    def __init__(
+        self,
+        frame: Iterable,
+        nulls: Iterable[str] = DEFAULT_NULLS,
+        booleans: Iterable[str] = DEFAULT_BOOLEANS,
+        case_sensitive: bool = True,
+        header: bool = True,
+        max_malformed_rows: Union[int, None] = 0,
+        malformed_sample_size: int = 10,
+        outlier_threshold: Union[float, None] = None,
+        outlier_sample_size: int = 10,
+        columns: Union[List[Union[str, int]], None] = None,
+    ):
+        super().__init__(
+            frame,
+            nulls,
+            booleans,
+            case_sensitive,
+            outlier_threshold,
+            outlier_sample_size,
+            columns,
+        )
+        self.header = header
+        self.max_malformed_rows = max_malformed_rows
+        self.malformed_sample_size = malformed_sample_size
+        self._first_row = None
+        self._width = None
+        self._indexes = None
 
         self._re_pattern_float = re.compile(
             r"[+-]?((\d+\.\d*)|(\.\d+)|(\d+))([eE][+-]?\d+)?$"
         )
         self._re_pattern_int = re.compile(r"(\d+)(\.0*)?$")
+        # Float pattern with integers matched first by a named group
+        self._re_pattern_number = re.compile(
+            r"(?:(?P<integer>\d+(?:\.0*)?)|[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)$"
+        )
+        # Whole blocks of newline joined values, nulls included if known up front
+        nulls = (
+            "".join("|" + re.escape(null) for null in sorted(self._nulls))
+            if isinstance(self._nulls, frozenset)
+            else ""
+        )
+        self._re_block = {}
+        for dtype, pattern in (
+            ("integer", r"\d+(?:\.0*)?"),
+            ("float", r"[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?"),
+        ):
+            item = f"(?:{pattern}{nulls})"
+            self._re_block[dtype] = re.compile(f"{item}(?:\n{item})*")
 
     def _is_null(self, value: str) -> bool:
         return value in self._nulls
@@ -90,6 +334,8 @@ class CSVScanner(Scanner):
 
     @staticmethod
     def _is_date_or_timestamp(value: str) -> Union[bool, str]:
+        if not _is_date_candidate(value):
+            return False
         try:
             parsed = pendulum.parse(value)
             if (
@@ -105,45 +351,58 @@ class CSVScanner(Scanner):
 
     @staticmethod
     def _is_json(value: str) -> bool:
+        # Only objects and arrays are considered json, so anything
+        # that doesn't look like one is rejected before parsing
+        value = value.strip()
+        if not value or _JSON_BRACKETS.get(value[0]) != value[-1]:
+            return False
         try:
             ujson.loads(value)
         except:
             return False
         return True
 
+    def _classify(self, value: str) -> str:
+        """Get the most specific type of a single value.
+
+        Numbers are recognized with a single match of a combined pattern,
+        and dates/json are only parsed if the value can be one of them.
+        """
+        if value in self._nulls:
+            return "unknown"
+        match = self._re_pattern_number.match(value)
+        if match:
+            return "float" if match.group("integer") is None else "integer"
+        date_type = self._is_date_or_timestamp(value)
+        if date_type:
+            return date_type
+        if self._is_json(value):
+            return "json"
+        # If defining values parsed as booleans
+        # is allowed, it has to be checked last
+        if value in self._booleans:
+            return "boolean"
+        return "string"
+
     def _get_dtype(self, value: str, dtype: str = "unknown") -> str:
 
         # Get type of first non-null value
         if dtype == "unknown":
-            if self._is_null(value):
-                return "unknown"
-            if self._is_float(value):
-                if self._is_integer(value):
-                    return "integer"
-                return "float"
-            date_type = self._is_date_or_timestamp(value)
-            if date_type:
-                return date_type
-            if self._is_json(value):
-                return "json"
-            # If defining values parsed as booleans
-            # is allowed, it has to be checked last
-            if self._is_boolean(value):
-                return "boolean"
-            return "string"
+            return self._classify(value)
 
         # Based on first non-null value, either stick
         # with the type or change it to more generic
         # avoiding checks for impossible types
 
         # If dtype is a string or value is null, then keep the dtype
-        if dtype == "string" or self._is_null(value):
+        if dtype == "string" or value in self._nulls:
             return dtype
 
         if dtype == "integer":
-            if self._is_integer(value):
-                return "integer"
-            dtype = "float"
+            match = self._re_pattern_number.match(value)
+            if match:
+                return "float" if match.group("integer") is None else "integer"
+            dtype = "boolean"
 
         if dtype == "float":
             if self._is_float(value):
@@ -167,45 +426,195 @@ class CSVScanner(Scanner):
 
         return "string"
 
-    def get_schema(self) -> Dict:
+    def _read_header(self) -> List[str]:
+        """Read the first row, return names of selected columns."""
         try:
             head = next(self.frame)
         except:
             raise ValueError("Failed to read header, empty file")
 
+        self.metrics = dict(malformed_rows=0, malformed_sample=[])
+        self._width = len(head)
+
+        if self.header:
+            self._first_row = None
+        else:
+            # Without a header, first row holds data and defines number of columns
+            self._first_row = head
+            head = [f"column_{idx}" for idx in range(1, len(head) + 1)]
+
+        if self.columns is None:
+            self._indexes = None
+            return head
+        self._indexes = resolve_columns(self.columns, head)
+        return [head[idx] for idx in self._indexes]
+
+    def _skip_malformed_row(self) -> None:
+        malformed_rows = self.metrics["malformed_rows"] + 1
+        line_num = getattr(self.frame, "line_num", None)
+        if (
+            self.max_malformed_rows is not None
+            and malformed_rows > self.max_malformed_rows
+        ):
+            raise ValueError(
+                "Malformed data, invalid row length"
+                + (f" (line {line_num})" if line_num is not None else "")
+            )
+
+        self.metrics["malformed_rows"] = malformed_rows
+        if len(self.metrics["malformed_sample"]) < self.malformed_sample_size:
+            self.metrics["malformed_sample"].append(line_num)
+
+    def _get_rows(self) -> Iterator[Sequence[str]]:
+        """Iterate over rows, validating number of columns on the way.
+
+        Rows of invalid length are skipped until max_malformed_rows
+        is exceeded. Line numbers of the first few are kept in metrics.
+        With columns selected, rows hold only their values, and frames
+        that can select them on their own (see CSVReader) are let to.
+        """
+        width = self._width
+
+        if self._indexes is None:
+            if self._first_row is not None:
+                yield self._first_row
+            for row in self.frame:
+                if len(row) == width:
+                    yield row
+                else:
+                    self._skip_malformed_row()
+            return
+
+        project = get_projection(self._indexes)
+        if self._first_row is not None:
+            yield project(self._first_row)
+        select = getattr(self.frame, "select", None)
+        if select is not None:
+            rows = select(self._indexes, width)
+        else:
+            rows = (project(row) if len(row) == width else None for row in self.frame)
+        for row in rows:
+            if row is not None:
+                yield row
+            else:
+                self._skip_malformed_row()
+
+    @staticmethod
+    def _select_baseline(
+        baseline: Dict[str, str],
+        head: List[str],
+        columns: Union[List[Union[str, int]], None],
+    ) -> Dict[str, str]:
+        """Keep only columns of a baseline that can be selected."""
+        if columns is None:
+            return baseline
+        names = set(head).union(column for column in columns if isinstance(column, str))
+        return {name: type_ for name, type_ in baseline.items() if name in names}
+
+    def _is_numeric_block(self, values: Tuple[str, ...], dtype: str) -> bool:
+        """Check if all the values keep an integer or float column type."""
+        if dtype == "integer":
+            joined = "".join(values)
+            # Plain digits, unless some values are empty
+            if joined.isdecimal() and ("" in self._nulls or all(values)):
+                return True
+        joined = "\n".join(values)
+        # Values with newlines are checked one by one
+        if joined.count("\n") != len(values) - 1:
+            return False
+        return self._re_block[dtype].fullmatch(joined) is not None
+
+    def get_schema(self) -> Dict:
+        head = self._read_header()
+        if self.outlier_threshold is not None:
+            return self._get_csv_tolerant_schema(head)
+
         types = ["unknown"] * len(head)
 
-        for row in self.frame:
-            if len(row) != len(head):
-                raise ValueError("Malformed data, invalid row length")
+        # Columns are typed block by block, numbers are checked
+        # for a whole block at once, other values one by one
+        rows = self._get_rows()
+        for block in iter(lambda: list(islice(rows, _BLOCK_SIZE)), []):
+            for idx, values in enumerate(zip(*block)):
+                dtype = types[idx]
+                if dtype == "string":
+                    continue
+                if dtype in ("integer", "float") and self._is_numeric_block(
+                    values, dtype
+                ):
+                    continue
+
+                previous = None
+                for value in values:
+                    # Resolving the same value twice never changes the type
+                    if value != previous:
+                        dtype = self._get_dtype(value, dtype)
+                        previous = value
+                types[idx] = dtype
 
+        return dict(zip(head, types))
+
+    def _get_csv_tolerant_schema(self, head: List[str]) -> Dict:
+        counters = [TypeCounter(self.outlier_sample_size) for _ in head]
+        previous = [None] * len(head)
+
+        for row_num, row in enumerate(self._get_rows(), 1):
+            # Line numbers of rows, if the reader tracks them
+            position = getattr(self.frame, "line_num", None) or row_num
             for idx, value in enumerate(row):
-                types[idx] = self._get_dtype(value, types[idx])
+                if value in self._nulls:
+                    continue
+                counter = counters[idx]
+                # Same value has the same type, there is no need to resolve it
+                if value == previous[idx]:
+                    counter.add(*counter.last, value, position)
+                    continue
+                previous[idx] = value
+                self._count_value(counter, value, position)
 
-        return dict(zip(head, types))
+        return self._get_tolerant_schema(dict(zip(head, counters)))
+
+    def get_state(self) -> SchemaState:
+        head = self._read_header()
+
+        states = [TYPES] * len(head)
+
+        for row in self._get_rows():
+            for idx, value in enumerate(row):
+                states[idx] = self._get_transitions(value, states[idx])
+
+        return SchemaState(
+            {name: ColumnState(state) for name, state in zip(head, states)}
+        )
+
+    def get_drift(self, baseline: Dict[str, str], early_exit: bool = True) -> Dict:
+        head = self._read_header()
+        detector = DriftDetector(self._select_baseline(baseline, head, self.columns))
+        if detector.set_columns(head) and early_exit:
+            return detector.report(complete=False)
+
+        types = ["unknown"] * len(head)
+        checked = [idx for idx, name in enumerate(head) if detector.can_drift(name)]
+
+        for row in self._get_rows():
+            for idx in checked:
+                dtype = self._get_dtype(row[idx], types[idx])
+                if dtype != types[idx]:
+                    types[idx] = dtype
+                    if detector.update(head[idx], dtype) and early_exit:
+                        return detector.report(complete=False)
+
+        return detector.report()
 
 
 class JSONScanner(Scanner):
-    """Allows to iterate over a frame (created by JSONLoader) and generate a schema."""
+    """Allows to iterate over a frame (created by JSONLoader) and generate a schema.
 
-    def __init__(self, frame: Iterable):
-        self.frame = frame
-        self._nulls = ["", "NULL", "Null", "null", "None", "none", "NA", "N/A"]
-        self._booleans = [
-            "True",
-            "False",
-            "true",
-            "false",
-            "t",
-            "f",
-            "T",
-            "F",
-            "1",
-            "0",
-        ]
+    Columns are selected by key path prefixes, see match_key_path.
+    """
 
     def _is_null(self, value: Any) -> bool:
-        return value is None or value in self._nulls
+        return value is None or (isinstance(value, str) and value in self._nulls)
 
     @staticmethod
     def _is_float(value: Any) -> bool:
@@ -219,16 +628,21 @@ class JSONScanner(Scanner):
     def _is_integer(value: Any) -> bool:
         if isinstance(value, int):
             return True
-        if isinstance(value, Decimal) or isinstance(value, float):
-            return value % 1 == 0
+        if isinstance(value, Decimal):
+            # Modulo fails for exponents beyond decimal precision
+            return value == value.to_integral_value()
+        if isinstance(value, float):
+            return value.is_integer()
         return False
 
     def _is_boolean(self, value: Any) -> bool:
-        return isinstance(value, bool) or value in self._booleans
+        return isinstance(value, bool) or (
+            isinstance(value, str) and value in self._booleans
+        )
 
     @staticmethod
     def _is_date_or_timestamp(value: Any) -> Union[bool, str]:
-        if not isinstance(value, str):
+        if not isinstance(value, str) or not _is_date_candidate(value):
             return False
         try:
             parsed = pendulum.parse(value)
@@ -306,14 +720,225 @@ class JSONScanner(Scanner):
 
         return "string"
 
+    def _get_records(self) -> Iterable[Dict]:
+        """Get records, with only selected keys if columns are given."""
+        if self.columns is None:
+            return self.frame
+        select = getattr(self.frame, "select", None)
+        if select is not None:
+            return select(self.columns)
+        return (
+            {
+                name: value
+                for name, value in record.items()
+                if match_key_path(name, self.columns)
+            }
+            for record in self.frame
+        )
+
+    def _select_baseline(self, baseline: Dict[str, str]) -> Dict[str, str]:
+        """Keep only columns of a baseline that can be selected."""
+        if self.columns is None:
+            return baseline
+        return {
+            name: type_
+            for name, type_ in baseline.items()
+            if match_key_path(name, self.columns)
+        }
+
     def get_schema(self) -> Dict:
+        if self.outlier_threshold is not None:
+            return self._get_json_tolerant_schema()
 
         types = {}
 
-        for row in self.frame:
+        for row in self._get_records():
             for column_name, value in row.items():
                 types[column_name] = self._get_dtype(
                     value, types[column_name] if column_name in types else "unknown"
                 )
 
         return types
+
+    def _get_json_tolerant_schema(self) -> Dict:
+        counters = {}
+
+        for row_num, row in enumerate(self._get_records(), 1):
+            for column_name, value in row.items():
+                counter = counters.get(column_name)
+                if counter is None:
+                    counter = counters[column_name] = TypeCounter(
+                        self.outlier_sample_size
+                    )
+                if not self._is_null(value):
+                    self._count_value(counter, value, row_num)
+
+        return self._get_tolerant_schema(counters)
+
+    def get_state(self) -> SchemaState:
+
+        states = {}
+
+        for row in self._get_records():
+            for column_name, value in row.items():
+                states[column_name] = self._get_transitions(
+                    value, states[column_name] if column_name in states else TYPES
+                )
+
+        return SchemaState({name: ColumnState(state) for name, state in states.items()})
+
+    def get_drift(self, baseline: Dict[str, str], early_exit: bool = True) -> Dict:
+        detector = DriftDetector(self._select_baseline(baseline))
+
+        types = {}
+
+        for row in self._get_records():
+            for column_name, value in row.items():
+                previous = types.get(column_name)
+                dtype = self._get_dtype(value, previous or "unknown")
+                if dtype != previous:
+                    types[column_name] = dtype
+                    if detector.update(column_name, dtype) and early_exit:
+                        return detector.report(complete=False)
+
+        return detector.report()
+
+
+class JSONEventScanner(JSONScanner):
+    """Allows to iterate over parse events (created by JSONEventLoader) and generate a schema.
+
+    Keys are flattened like in JSONReader, but records are never
+    materialized, so memory use depends only on the number of keys.
+    Objects nested deeper than max_depth are typed as json, keys found
+    after max_keys distinct keys are skipped (and counted in metrics),
+    so no more than max_keys names are kept.
+    Values of keys that are not selected are skipped without typing.
+    """
+
+    def __init__(
+        self,
+        frame: Iterable,
+        *args,
+        max_depth: Union[int, None] = None,
+        max_keys: Union[int, None] = None,
+        sep: str = "_",
+        **kwargs,
+    ):
+        super().__init__(frame, *args, **kwargs)
+        self.max_depth = max_depth
+        self.max_keys = max_keys
+        self.sep = sep
+
+    @staticmethod
+    def _skip_value(events: Iterator) -> None:
+        """Consume events up to the end of current array or object."""
+        depth = 1
+        for event, _ in events:
+            if event == "start_map" or event == "start_array":
+                depth += 1
+            elif event == "end_map" or event == "end_array":
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _iter_values(self, seen: Dict) -> Iterator[Tuple[str, Any]]:
+        """Get flattened key and value pairs, arrays and too deep objects are empty.
+
+        Keys that are not in seen (keys kept by the caller) are skipped
+        once it holds max_keys of them. Selection of a key (see
+        match_key_path) is checked under objects only some keys of which
+        are selected, objects that are not selected are skipped whole.
+        """
+        events = iter(self.frame)
+        max_depth = self.max_depth
+        max_keys = self.max_keys
+        sep = self.sep
+        columns = self.columns
+
+        skipped_values = 0
+        # Flattened names of open objects (record itself is ""), and
+        # whether they are selected (None if only some keys nested under them are)
+        parents = []
+        selections = []
+        in_list = False
+        key = None
+        selected = True
+
+        for event, value in events:
+            if event == "map_key":
+                parent = parents[-1]
+                key = parent + sep + value if parent else value
+                if columns is not None:
+                    selected = selections[-1] or match_key_path(key, columns, sep)
+                continue
+            if not parents:
+                # Either a single record or a list of records
+                if event == "start_map":
+                    parents.append("")
+                    selections.append(True if columns is None else None)
+                elif event == "start_array" and not in_list:
+                    in_list = True
+                elif event == "end_array" and in_list:
+                    in_list = False
+                else:
+                    raise ValueError("Malformed data, records have to be json objects")
+                continue
+
+            if event == "start_map":
+                if selected is not False and (
+                    max_depth is None or len(parents) <= max_depth
+                ):
+                    parents.append(key)
+                    selections.append(selected)
+                    continue
+                self._skip_value(events)
+                value = {}
+            elif event == "end_map":
+                parents.pop()
+                selections.pop()
+                continue
+            elif event == "start_array":
+                self._skip_value(events)
+                value = []
+
+            if not selected:
+                continue
+            if max_keys is not None and key not in seen and len(seen) >= max_keys:
+                skipped_values += 1
+                continue
+            yield key, value
+
+        if max_keys is not None:
+            self.metrics["skipped_values"] = skipped_values
+
+    def get_schema(self) -> Dict:
+
+        types = {}
+
+        for key, value in self._iter_values(types):
+            types[key] = self._get_dtype(value, types.get(key, "unknown"))
+
+        return types
+
+    def get_state(self) -> SchemaState:
+
+        states = {}
+
+        for key, value in self._iter_values(states):
+            states[key] = self._get_transitions(value, states.get(key, TYPES))
+
+        return SchemaState({name: ColumnState(state) for name, state in states.items()})
+
+    def get_drift(self, baseline: Dict[str, str], early_exit: bool = True) -> Dict:
+        detector = DriftDetector(self._select_baseline(baseline))
+
+        types = {}
+
+        for key, value in self._iter_values(types):
+            previous = types.get(key)
+            dtype = types[key] = self._get_dtype(value, previous or "unknown")
+            if dtype != previous:
+                if detector.update(key, dtype) and early_exit:
+                    return detector.report(complete=False)
+
+        return detector.report()
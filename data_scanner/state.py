@@ -0,0 +1,126 @@
+from typing import Dict, List, Iterable
+
+TYPES = (
+    "unknown",
+    "integer",
+    "float",
+    "boolean",
+    "date",
+    "timestamp",
+    "json",
+    "string",
+)
+
+_TYPE_INDEX = {type_: idx for idx, type_ in enumerate(TYPES)}
+
+# Types a column can end a scan with, by type it has during the scan.
+# Scanners resolve values against the current type (see _get_dtype),
+# a column that fails its type falls back to boolean, then string
+REACHABLE_TYPES = {
+    "unknown": frozenset(TYPES),
+    "integer": frozenset(("integer", "float", "boolean", "string")),
+    "float": frozenset(("float", "boolean", "string")),
+    "boolean": frozenset(("boolean", "string")),
+    "date": frozenset(("date", "timestamp", "boolean", "string")),
+    "timestamp": frozenset(("date", "timestamp", "boolean", "string")),
+    "json": frozenset(("json", "boolean", "string")),
+    "string": frozenset(("string",)),
+}
+
+
+class ColumnState:
+    """Mergeable scan state of a single column.
+
+    Scanners resolve column types sequentially, so the type found
+    for a chunk of rows depends on the type the column had before
+    that chunk. ColumnState keeps the type a chunk ends with for every
+    type it could start with. Merging two consecutive chunks is then
+    a composition of those mappings, which is associative and has
+    an empty chunk (all types mapped onto themselves) as identity.
+    """
+
+    __slots__ = ("transitions",)
+
+    def __init__(self, transitions: Iterable[str] = TYPES):
+        self.transitions = tuple(transitions)
+        if len(self.transitions) != len(TYPES):
+            raise ValueError(
+                "Invalid column state, one type per starting type expected"
+            )
+
+    @property
+    def dtype(self) -> str:
+        """Type of the column when scanned from the beginning."""
+        return self.transitions[0]
+
+    def merge(self, other: "ColumnState") -> "ColumnState":
+        """Combine with a state of the chunk that directly follows this one."""
+        return ColumnState(
+            other.transitions[_TYPE_INDEX[dtype]] for dtype in self.transitions
+        )
+
+    def to_list(self) -> List[str]:
+        return list(self.transitions)
+
+    @classmethod
+    def from_list(cls, transitions: List[str]) -> "ColumnState":
+        return cls(transitions)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ColumnState) and self.transitions == other.transitions
+
+    def __repr__(self) -> str:
+        return f"ColumnState({self.transitions!r})"
+
+
+class SchemaState:
+    """Mergeable scan state of a file or of a chunk of a file.
+
+    Holds ColumnState for every column seen, in order of appearance.
+    Columns missing from one of the merged states are treated as if
+    they only contained nulls in that chunk.
+    """
+
+    def __init__(self, columns: Dict[str, ColumnState] = None):
+        self.columns = columns if columns is not None else {}
+
+    def merge(self, other: "SchemaState") -> "SchemaState":
+        """Combine with a state of the chunk that directly follows this one."""
+        columns = {}
+        for name, state in self.columns.items():
+            if name in other.columns:
+                state = state.merge(other.columns[name])
+            columns[name] = state
+        for name, state in other.columns.items():
+            if name not in columns:
+                columns[name] = state
+        return SchemaState(columns)
+
+    @classmethod
+    def merge_all(cls, states: Iterable["SchemaState"]) -> "SchemaState":
+        """Combine states of consecutive chunks, in order."""
+        result = cls()
+        for state in states:
+            result = result.merge(state)
+        return result
+
+    def get_schema(self) -> Dict[str, str]:
+        return {name: state.dtype for name, state in self.columns.items()}
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """Serialize into a json/pickle friendly dictionary."""
+        return {name: state.to_list() for name, state in self.columns.items()}
+
+    @classmethod
+    def from_dict(cls, columns: Dict[str, List[str]]) -> "SchemaState":
+        return cls(
+            {name: ColumnState.from_list(state) for name, state in columns.items()}
+        )
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SchemaState) and list(self.columns.items()) == list(
+            other.columns.items()
+        )
+
+    def __repr__(self) -> str:
+        return f"SchemaState({self.columns!r})"
@@ -0,0 +1,121 @@
+from array import array
+import struct
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Tuple, Union
+
+from .state import TYPES, _TYPE_INDEX
+
+# Number of columns, number of new names and size of encoded new names
+_HEADER = struct.Struct("!III")
+
+# Smaller payloads are cheaper to pass through a queue than shared memory
+SHARED_MEMORY_MIN_SIZE = 64 * 1024
+
+
+class SchemaEncoder:
+    """Encodes schemas found by a single worker into a compact binary layout.
+
+    Every column is an id of its name (4 bytes) and a type code (1 byte).
+    Names are interned, each one is sent only the first time it's seen,
+    so schemas of similar files cost a few bytes per column. Schemas
+    have to be decoded in order by a single SchemaDecoder.
+    """
+
+    def __init__(self):
+        self._ids = {}
+
+    def encode(self, schema: Dict[str, str]) -> Union[bytes, None]:
+        """Encode a schema, None if a column name contains a null character."""
+        ids = self._ids
+        new_names = [name for name in schema if name not in ids]
+        encoded_names = "\0".join(new_names)
+        if encoded_names.count("\0") != max(len(new_names) - 1, 0):
+            return None
+        encoded_names = encoded_names.encode("utf-8", errors="surrogatepass")
+
+        for name in new_names:
+            ids[name] = len(ids)
+        column_ids = array("I", map(ids.__getitem__, schema))
+        codes = bytes(map(_TYPE_INDEX.__getitem__, schema.values()))
+
+        return b"".join(
+            (
+                _HEADER.pack(len(codes), len(new_names), len(encoded_names)),
+                column_ids.tobytes(),
+                codes,
+                encoded_names,
+            )
+        )
+
+
+class SchemaDecoder:
+    """Decodes schemas encoded by a single SchemaEncoder."""
+
+    def __init__(self):
+        self._names = []
+
+    def decode(self, buffer: bytes) -> Dict[str, str]:
+        n_columns, n_new_names, names_size = _HEADER.unpack_from(buffer)
+        offset = _HEADER.size
+
+        column_ids = array("I")
+        column_ids.frombytes(buffer[offset : offset + n_columns * column_ids.itemsize])
+        offset += n_columns * column_ids.itemsize
+
+        codes = buffer[offset : offset + n_columns]
+        offset += n_columns
+
+        if n_new_names > 0:
+            self._names.extend(
+                buffer[offset : offset + names_size]
+                .decode("utf-8", errors="surrogatepass")
+                .split("\0")
+            )
+
+        # Names are shared between schemas, their hashes are computed once
+        return dict(
+            zip(
+                map(self._names.__getitem__, column_ids),
+                map(TYPES.__getitem__, codes),
+            )
+        )
+
+
+def put_shared(payload: bytes, name: Union[str, None] = None) -> Tuple[str, int]:
+    """Copy payload into a new shared memory block, return its name and size.
+
+    Block is left for the reader to remove (see take_shared). With a
+    name given, the reader can remove it even if the handle never
+    reaches it (see unlink_shared).
+    """
+    block = shared_memory.SharedMemory(name=name, create=True, size=len(payload))
+    try:
+        block.buf[: len(payload)] = payload
+        name = block.name
+    finally:
+        block.close()
+    # Reader owns the block now, it must outlive this process
+    resource_tracker.unregister(block._name, "shared_memory")
+    return name, len(payload)
+
+
+def take_shared(handle: Tuple[str, int]) -> bytes:
+    """Read payload written by put_shared and remove the shared memory block."""
+    name, size = handle
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(block.buf[:size])
+    finally:
+        block.close()
+        block.unlink()
+
+
+def unlink_shared(name: str) -> bool:
+    """Remove a shared memory block by name, False if there is none."""
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    block.close()
+    block.unlink()
+    return True
@@ -1,3 +1,10 @@
 from .test_csv import TestCSVProcessor
 from .test_json import TestJSONProcessor
 from .test_negotiator import TestNegotiator
+from .test_state import TestSchemaState
+from .test_distributed import TestDistributed
+from .test_arrow import TestArrow
+from .test_transport import TestTransport
+from .test_cli import TestCLI
+from .test_differential import TestDifferential
+from .test_checkpoint import TestCheckpoint
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+
+from data_scanner import Processor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from data_scanner.arrow import to_arrow_schema, write_schema
+except ImportError:
+    pa = None
+
+
+@unittest.skipUnless(pa is not None, "pyarrow not installed")
+class TestArrow(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.script_path = os.path.dirname(os.path.abspath(__file__))
+        cls.data_path = os.path.join(cls.script_path, "data", "csv")
+
+    def test_engines_agree(self):
+        print("[TEST] Running test_engines_agree...")
+
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            for options in (
+                {},
+                dict(header=False),
+                dict(max_malformed_rows=None),
+                dict(sniff_dialect=True),
+            ):
+                with self.subTest(file_name=file_name, **options):
+                    expected = Processor(data_path, "csv", **options).run()
+                    schemas = Processor(
+                        data_path, "csv", engine="arrow", **options
+                    ).run()
+                    self.assertEqual(schemas, expected)
+
+    def test_dates_in_batches(self):
+        print("[TEST] Running test_dates_in_batches...")
+
+        values = [
+            "2022-01-01T10:00:00",
+            "NULL",
+            "2022-01-02",
+            "2022-01-03 10:00:00",
+            "2022-02-30",
+            "0000-01-01",
+            "2022-01-01T23:59:60",
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, "dates.csv")
+            # Every prefix of values, so that batch check decides
+            # on valid dates and gives up on invalid ones
+            for end in range(1, len(values) + 1):
+                with open(data_path, "wt") as f:
+                    f.write("\n".join(["c_date"] + values[:end]) + "\n")
+                with self.subTest(values=values[:end]):
+                    expected = Processor(data_path, "csv").run()
+                    schemas = Processor(data_path, "csv", engine="arrow").run()
+                    self.assertEqual(schemas, expected)
+
+    def test_encoding(self):
+        print("[TEST] Running test_encoding...")
+
+        rows = [
+            "c_integer,c_date,c_null,c_string",
+            "1,2022-01-01,,abc",
+            "2,2022-01-02 10:00:00,néant,café",
+            "3,,néant,naïve",
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, "encoded.csv")
+            for encoding in ("utf-8", "utf-8-sig", "latin-1", "utf-16"):
+                with open(data_path, "wt", encoding=encoding) as f:
+                    f.write("\n".join(rows) + "\n")
+                for options in (
+                    {},
+                    dict(encoding=encoding),
+                    dict(encoding_errors="fallback"),
+                    dict(encoding_errors="replace", nulls=["", "néant"]),
+                ):
+                    with self.subTest(file_encoding=encoding, **options):
+                        expected = Processor(data_path, "csv", **options).run()
+                        self.assertNotEqual(expected, [{}])
+                        schemas = Processor(
+                            data_path, "csv", engine="arrow", **options
+                        ).run()
+                        self.assertEqual(schemas, expected)
+
+    def test_malformed_rows(self):
+        data_path = os.path.join(self.data_path, "malformed_rows.csv")
+
+        print("[TEST] Running test_malformed_rows...")
+
+        processor = Processor(data_path, "csv", engine="arrow")
+        self.assertEqual(processor.run(), [{}])
+
+        processor = Processor(data_path, "csv", engine="arrow", max_malformed_rows=2)
+        processor.run()
+        self.assertEqual(processor.metrics["files"][data_path]["malformed_rows"], 2)
+
+    def test_write_schema(self):
+        schema = {
+            "c_integer": "integer",
+            "c_float": "float",
+            "c_boolean": "boolean",
+            "c_date": "date",
+            "c_timestamp": "timestamp",
+            "c_json": "json",
+            "c_string": "string",
+            "c_unknown": "unknown",
+        }
+
+        print("[TEST] Running test_write_schema...")
+
+        arrow_schema = to_arrow_schema(schema)
+        self.assertEqual(arrow_schema.names, list(schema))
+        self.assertEqual(arrow_schema.field("c_timestamp").type, pa.timestamp("us"))
+        self.assertEqual(
+            arrow_schema.field("c_json").metadata, {b"data_scanner_type": b"json"}
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "schema.parquet")
+            write_schema(schema, file_path)
+            self.assertEqual(pq.read_schema(file_path).names, list(schema))
+
+            file_path = os.path.join(tmp_dir, "schema.arrow")
+            write_schema(schema, file_path, format="ipc")
+            with pa.OSFile(file_path, "rb") as source:
+                read_schema = pa.ipc.open_file(source).schema
+            self.assertTrue(read_schema.equals(arrow_schema, check_metadata=True))
@@ -0,0 +1,183 @@
+import os
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from data_scanner import Processor
+from data_scanner.checkpoint import Checkpoint
+from data_scanner.processor import scan_file
+
+
+class TestCheckpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.script_path = os.path.dirname(os.path.abspath(__file__))
+        cls.data_path = os.path.join(cls.script_path, "data", "csv")
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.tmp_dir, "checkpoint.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_records(self):
+        with open(self.checkpoint, "rt") as f:
+            return [json.loads(line) for line in f]
+
+    def _write_records(self, records):
+        with open(self.checkpoint, "wt") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def test_resume(self):
+        print("[TEST] Running test_resume...")
+
+        expected = Processor(self.data_path, "csv").run()
+        processor = Processor(self.data_path, "csv", checkpoint=self.checkpoint)
+        self.assertEqual(processor.run(), expected)
+
+        # Nothing is scanned again
+        processor = Processor(
+            self.data_path, "csv", checkpoint=self.checkpoint, resume=True
+        )
+        with mock.patch("data_scanner.processor.scan_file", side_effect=OSError):
+            self.assertEqual(processor.run(), expected)
+        for metrics in processor.metrics["files"].values():
+            self.assertTrue(metrics["resumed"])
+
+        # Grouped results hold schemas by file path, in any run order
+        expected = Processor(self.data_path, "csv", group_by="^").run()
+        for run in ("run_workers", "run_threads", "run_chunks"):
+            with self.subTest(run=run):
+                processor = Processor(
+                    self.data_path,
+                    "csv",
+                    group_by="^",
+                    checkpoint=self.checkpoint,
+                    resume=True,
+                )
+                self.assertEqual(getattr(processor, run)(2), expected)
+                for metrics in processor.metrics["files"].values():
+                    self.assertTrue(metrics["resumed"])
+
+    def test_interrupted(self):
+        print("[TEST] Running test_interrupted...")
+
+        data_path = os.path.join(self.tmp_dir, "data")
+        shutil.copytree(self.data_path, data_path)
+        expected = Processor(data_path, "csv", group_by="^").run()
+        Processor(data_path, "csv", checkpoint=self.checkpoint).run()
+
+        options, first, second, *records = self._read_records()
+        self._write_records([options, *records])
+        # Record cut short by the interruption
+        with open(self.checkpoint, "at") as f:
+            f.write(json.dumps(first)[:20])
+        # File changed since
+        os.utime(records[0]["file"], ns=(0, 0))
+
+        processor = Processor(
+            data_path, "csv", group_by="^", checkpoint=self.checkpoint, resume=True
+        )
+        self.assertEqual(processor.run_workers(2), expected)
+        scanned = {
+            file_name
+            for file_name, metrics in processor.metrics["files"].items()
+            if not metrics.get("resumed")
+        }
+        self.assertEqual(scanned, {first["file"], second["file"], records[0]["file"]})
+        self.assertEqual(len(self._read_records()), len(processor.metrics["files"]) + 1)
+
+        # Checkpoint of a scan with other options is not used
+        processor = Processor(
+            data_path,
+            "csv",
+            group_by="^",
+            checkpoint=self.checkpoint,
+            resume=True,
+            case_sensitive=False,
+        )
+        processor.run()
+        for metrics in processor.metrics["files"].values():
+            self.assertNotIn("resumed", metrics)
+
+    def test_resume_chunks(self):
+        print("[TEST] Running test_resume_chunks...")
+
+        data_path = os.path.join(self.tmp_dir, "big.csv")
+        with open(data_path, "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["a", "b", "c"])
+            for idx in range(2000):
+                writer.writerow([idx, idx / 2, "x" if idx == 1500 else idx % 2])
+        expected = Processor(data_path, "csv").run()
+
+        processor = Processor(data_path, "csv", checkpoint=self.checkpoint)
+        self.assertEqual(processor.run_chunks(4, min_chunk_size=1024), expected)
+        self.assertEqual(processor.metrics["files"][data_path]["chunks"], 4)
+
+        # Interrupted before the last chunk was done
+        records = self._read_records()
+        self.assertEqual(len(records[1]["split"]), 4)
+        self._write_records(records[:-2])
+
+        # Chunks done are reused, file is split the way it was
+        processor = Processor(data_path, "csv", checkpoint=self.checkpoint, resume=True)
+        self.assertEqual(processor.run_chunks(2, min_chunk_size=1024), expected)
+        metrics = processor.metrics["files"][data_path]
+        self.assertEqual(metrics["chunks"], 4)
+        self.assertEqual(metrics["resumed_chunks"], 3)
+
+    def test_changed_during_scan(self):
+        print("[TEST] Running test_changed_during_scan...")
+
+        data_path = os.path.join(self.tmp_dir, "data")
+        shutil.copytree(self.data_path, data_path)
+        changed, removed = (
+            os.path.join(data_path, file_name)
+            for file_name in ("valid_file.csv", "json_values.csv")
+        )
+        expected = Processor(data_path, "csv", group_by="^").run()
+
+        def scan_and_change(file_name, *args):
+            result = scan_file(file_name, *args)
+            if file_name == changed:
+                with open(changed, "rt") as f:
+                    width = len(next(csv.reader(f)))
+                # Last line has no line break
+                with open(changed, "at") as f:
+                    f.write("\n" + "," * (width - 1))
+            elif file_name == removed:
+                os.remove(removed)
+            return result
+
+        # Files are done as they were when their scans started
+        processor = Processor(
+            data_path, "csv", group_by="^", checkpoint=self.checkpoint
+        )
+        with mock.patch(
+            "data_scanner.processor.scan_file", side_effect=scan_and_change
+        ):
+            self.assertEqual(processor.run(), expected)
+
+        # Changed file is scanned again, removed one is gone
+        processor = Processor(
+            data_path, "csv", group_by="^", checkpoint=self.checkpoint, resume=True
+        )
+        processor.run()
+        scanned = [
+            file_name
+            for file_name, metrics in processor.metrics["files"].items()
+            if not metrics.get("resumed")
+        ]
+        self.assertEqual(scanned, [changed])
+        self.assertNotIn(removed, processor.metrics["files"])
+
+        # Files that can't be found before their scans are not checkpointed
+        with Checkpoint(self.checkpoint, {}) as checkpoint:
+            checkpoint.start_file(removed)
+            checkpoint.add_file(removed, {}, {})
+        self.assertEqual(self._read_records(), [{"options": {}}])
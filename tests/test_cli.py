@@ -0,0 +1,102 @@
+import io
+import os
+import sys
+import json
+import subprocess
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+from data_scanner.__main__ import main
+
+
+class TestCLI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.script_path = os.path.dirname(os.path.abspath(__file__))
+        cls.data_path = os.path.join(cls.script_path, "data")
+
+    def _run(self, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            code = main(list(args))
+        return code, stdout.getvalue()
+
+    def test_scan(self):
+        data_path = os.path.join(self.data_path, "csv", "valid_file.csv")
+
+        print("[TEST] Running test_scan...")
+
+        code, output = self._run(data_path, "-t", "csv", "-m", "sequential")
+        self.assertEqual(code, 0)
+        self.assertEqual(
+            json.loads(output),
+            [
+                {
+                    "c_string": "string",
+                    "c_integer": "integer",
+                    "c_float": "float",
+                    "c_boolean": "boolean",
+                    "c_date": "date",
+                    "c_timestamp": "timestamp",
+                    "c_json": "json",
+                }
+            ],
+        )
+
+        code, output = self._run(data_path, "-t", "csv", "-n", "-f", "text")
+        self.assertEqual(code, 0)
+        self.assertEqual(
+            output.splitlines()[:2], ["c_string: string", "c_integer: integer"]
+        )
+
+        code, output = self._run(data_path, "-t", "csv", "-n", "-c", "c_json,2")
+        self.assertEqual(code, 0)
+        self.assertEqual(json.loads(output), {"c_float": "float", "c_json": "json"})
+
+        data_path = os.path.join(self.data_path, "json", "valid_json_list.json")
+        for engine in ("python", "streaming"):
+            code, output = self._run(data_path, "-t", "json", "-e", engine, "-n")
+            self.assertEqual(code, 0)
+            self.assertIsInstance(json.loads(output), dict)
+
+    def test_group_by(self):
+        data_path = os.path.join(self.data_path, "partitioned")
+
+        print("[TEST] Running test_group_by...")
+
+        code, output = self._run(data_path, "-t", "csv", "-r", "-g", "1")
+        self.assertEqual(code, 0)
+        self.assertEqual(list(json.loads(output)["groups"]), ["table=a", "table=b"])
+
+        code, output = self._run(
+            data_path, "-t", "csv", "-r", "-g", "table=(\\w+)", "-f", "text"
+        )
+        self.assertEqual(code, 0)
+        self.assertEqual(output.splitlines()[0], "[a]")
+
+    def test_failed_files(self):
+        print("[TEST] Running test_failed_files...")
+
+        data_path = os.path.join(self.data_path, "csv", "empty_file")
+        self.assertEqual(self._run(data_path, "-t", "csv")[0], 1)
+
+        data_path = os.path.join(self.data_path, "csv", "missing.csv")
+        self.assertEqual(self._run(data_path, "-t", "csv")[0], 1)
+
+    def test_lazy_imports(self):
+        print("[TEST] Running test_lazy_imports...")
+
+        modules = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, data_scanner; print(' '.join(sys.modules))",
+            ],
+            cwd=os.path.dirname(self.script_path),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        for module in ("pendulum", "ujson", "ijson", "multiprocessing"):
+            self.assertNotIn(module, modules)
+        self.assertNotIn("data_scanner.processor", modules)
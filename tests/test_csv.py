@@ -1,7 +1,12 @@
 import os
+import csv
+import tempfile
 import unittest
+from unittest import mock
 
 from data_scanner import Processor
+from data_scanner.loader import FALLBACK_ERRORS, detect_encoding, sniff_dialect
+from data_scanner.scanner import CSVScanner
 
 
 class TestCSVProcessor(unittest.TestCase):
@@ -137,3 +142,542 @@ class TestCSVProcessor(unittest.TestCase):
         processor = Processor(data_path, "csv")
         schemas = processor.run_workers()
         self.assertEqual(schemas, expected_schemas)
+
+    def test_json_values(self):
+        # Only objects and arrays are recognized as json
+        data_path = os.path.join(self.data_path, "json_values.csv")
+        expected_schemas = [
+            {
+                "c_scalar": "string",
+                "c_object": "json",
+                "c_text": "string",
+            }
+        ]
+
+        print("[TEST] Running test_json_values...")
+
+        processor = Processor(data_path, "csv")
+        schemas = processor.run()
+        self.assertEqual(schemas, expected_schemas)
+
+        processor = Processor(data_path, "csv", negotiate_schema=True)
+        schema = processor.run()
+        self.assertEqual(schema, *expected_schemas)
+
+        processor = Processor(data_path, "csv")
+        schemas = processor.run_workers()
+        self.assertEqual(schemas, expected_schemas)
+
+    def test_custom_vocabulary(self):
+        data_path = os.path.join(self.data_path, "custom_vocabulary.csv")
+        options = dict(nulls=["-", "N/D"], booleans=["yes", "no"], case_sensitive=False)
+        expected_schemas = [{"c_flag": "boolean", "c_number": "integer"}]
+
+        print("[TEST] Running test_custom_vocabulary...")
+
+        processor = Processor(data_path, "csv")
+        schemas = processor.run()
+        self.assertEqual(schemas, [{"c_flag": "string", "c_number": "string"}])
+
+        processor = Processor(data_path, "csv", **options)
+        schemas = processor.run()
+        self.assertEqual(schemas, expected_schemas)
+
+        processor = Processor(data_path, "csv", negotiate_schema=True, **options)
+        schema = processor.run()
+        self.assertEqual(schema, *expected_schemas)
+
+        processor = Processor(data_path, "csv", **options)
+        schemas = processor.run_workers()
+        self.assertEqual(schemas, expected_schemas)
+
+    def test_malformed_rows_skipped(self):
+        data_path = os.path.join(self.data_path, "malformed_rows.csv")
+        expected_schemas = [{"c_integer": "integer", "c_string": "string"}]
+        expected_metrics = dict(malformed_rows=2, malformed_sample=[3, 5])
+
+        print("[TEST] Running test_malformed_rows_skipped...")
+
+        processor = Processor(data_path, "csv", max_malformed_rows=2)
+        schemas = processor.run()
+        self.assertEqual(schemas, expected_schemas)
+        self.assertEqual(processor.metrics["files"][data_path], expected_metrics)
+
+        processor = Processor(data_path, "csv", max_malformed_rows=None)
+        schemas = processor.run_workers()
+        self.assertEqual(schemas, expected_schemas)
+        self.assertEqual(processor.metrics["files"][data_path], expected_metrics)
+
+        # Exceeding the limit fails the whole file
+        processor = Processor(data_path, "csv", max_malformed_rows=1)
+        schemas = processor.run()
+        self.assertEqual(schemas, [{}])
+
+    def test_headerless(self):
+        data_path = os.path.join(self.data_path, "headerless.csv")
+        expected_schemas = [
+            {"column_1": "integer", "column_2": "string", "column_3": "date"}
+        ]
+
+        print("[TEST] Running test_headerless...")
+
+        processor = Processor(data_path, "csv", header=False)
+        schemas = processor.run()
+        self.assertEqual(schemas, expected_schemas)
+
+        processor = Processor(data_path, "csv", header=False, negotiate_schema=True)
+        schema = processor.run()
+        self.assertEqual(schema, *expected_schemas)
+
+        processor = Processor(data_path, "csv", header=False)
+        schemas = processor.run_workers()
+        self.assertEqual(schemas, expected_schemas)
+
+    def test_sniff_dialect(self):
+        expected = {
+            "pipe_delimited_bom.csv": [
+                {"c_integer": "integer", "c_string": "string", "c_json": "json"}
+            ],
+            "tab_delimited.csv": [
+                {"c_integer": "integer", "c_float": "float", "c_string": "string"}
+            ],
+        }
+
+        print("[TEST] Running test_sniff_dialect...")
+
+        for file_name, expected_schemas in expected.items():
+            data_path = os.path.join(self.data_path, file_name)
+
+            processor = Processor(data_path, "csv", sniff_dialect=True)
+            schemas = processor.run()
+            self.assertEqual(schemas, expected_schemas)
+
+            processor = Processor(data_path, "csv", sniff_dialect=True)
+            schemas = processor.run_workers()
+            self.assertEqual(schemas, expected_schemas)
+
+        data_path = os.path.join(self.data_path, "pipe_delimited_bom.csv")
+        self.assertIs(sniff_dialect(data_path), sniff_dialect(data_path))
+        self.assertEqual(sniff_dialect(data_path)[0], "utf-8-sig")
+
+    def test_encoding(self):
+        data_path = os.path.join(self.data_path, "latin1.csv")
+        expected_schemas = [
+            {"c_integer": "integer", "c_string": "string", "c_float": "float"}
+        ]
+
+        print("[TEST] Running test_encoding...")
+
+        # Not valid UTF-8 from the start
+        processor = Processor(data_path, "csv")
+        self.assertEqual(processor.run(), expected_schemas)
+        processor = Processor(data_path, "csv", encoding="utf-8")
+        self.assertEqual(processor.run(), [{}])
+        processor = Processor(
+            data_path, "csv", encoding="utf-8", encoding_errors="fallback"
+        )
+        self.assertEqual(processor.run(), expected_schemas)
+
+        # Prefix can end halfway through a character
+        self.assertEqual(detect_encoding("café".encode()[:-1], truncated=True), "utf-8")
+        self.assertEqual(detect_encoding("café".encode("cp1252")), "cp1252")
+        self.assertEqual(detect_encoding(b"\x81"), "latin-1")
+        self.assertEqual(
+            b"caf\xc3\xa9 caf\xe9 \x81".decode("utf-8", FALLBACK_ERRORS),
+            "café café \x81",
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Not valid UTF-8 past the prefix encoding is detected from
+            data_path = os.path.join(tmp_dir, "late_latin1.csv")
+            with open(data_path, "wb") as f:
+                f.write(b"c_integer,c_string\n" + b"1,abc\n" * 20000)
+                f.write("2,café\n".encode("latin-1"))
+            expected_schemas = [{"c_integer": "integer", "c_string": "string"}]
+
+            processor = Processor(data_path, "csv")
+            self.assertEqual(processor.run(), [{}])
+            for errors in ("fallback", "replace"):
+                processor = Processor(data_path, "csv", encoding_errors=errors)
+                self.assertEqual(processor.run(), expected_schemas)
+                self.assertEqual(
+                    processor.run_chunks(workers=2, min_chunk_size=1024),
+                    expected_schemas,
+                )
+
+    def test_directory(self):
+        print("[TEST] Running test_directory...")
+
+        processor = Processor(self.data_path, "csv")
+        self.assertEqual(
+            processor.file_list,
+            {
+                os.path.join(self.data_path, file_name)
+                for file_name in os.listdir(self.data_path)
+            },
+        )
+
+    def test_run_modes(self):
+        print("[TEST] Running test_run_modes...")
+
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            for options in ({}, dict(header=False), dict(sniff_dialect=True)):
+                with self.subTest(file_name=file_name, **options):
+                    expected = Processor(data_path, "csv", **options).run()
+
+                    processor = Processor(data_path, "csv", **options)
+                    self.assertEqual(processor.run_threads(workers=2), expected)
+
+                    # Tiny chunks, so that every file gets split
+                    processor = Processor(data_path, "csv", **options)
+                    self.assertEqual(
+                        processor.run_chunks(workers=3, min_chunk_size=8), expected
+                    )
+
+                    processor = Processor(data_path, "csv", **options)
+                    self.assertEqual(processor.run_auto(), expected)
+
+    def test_plan(self):
+        data_path = os.path.join(self.data_path, "valid_file.csv")
+
+        print("[TEST] Running test_plan...")
+
+        processor = Processor(data_path, "csv")
+        self.assertEqual(processor.plan(workers=1), "sequential")
+        self.assertEqual(processor.plan(workers=8), "sequential")
+        self.assertEqual(Processor(self.data_path, "csv").plan(), "sequential")
+
+        # Pretend files are slow to scan and big enough to be split
+        with mock.patch.dict(
+            "data_scanner.processor._SCAN_RATES", {("csv", "python"): 1}
+        ), mock.patch("data_scanner.processor._MIN_CHUNK_SIZE", 8):
+            self.assertEqual(processor.plan(workers=1), "sequential")
+            self.assertEqual(processor.plan(workers=4), "chunks")
+
+            processor = Processor(data_path, "csv", max_malformed_rows=None)
+            self.assertEqual(processor.plan(workers=4), "processes")
+
+    def test_check_drift(self):
+        data_path = os.path.join(self.data_path, "valid_file.csv")
+        baseline = {
+            "c_string": "string",
+            "c_integer": "integer",
+            "c_float": "float",
+            "c_boolean": "boolean",
+            "c_date": "date",
+            "c_timestamp": "timestamp",
+            "c_json": "json",
+        }
+        drifted = {
+            **baseline,
+            "c_float": "integer",
+            "c_removed": "string",
+        }
+        del drifted["c_json"]
+
+        print("[TEST] Running test_check_drift...")
+
+        engines = ["python"]
+        try:
+            import pyarrow  # noqa: F401
+
+            engines.append("arrow")
+        except ImportError:
+            pass
+
+        for engine in engines:
+            with self.subTest(engine=engine):
+                processor = Processor(data_path, "csv", engine=engine)
+                self.assertEqual(
+                    processor.check_drift(baseline),
+                    {data_path: dict(changed={}, added={}, removed=[], complete=True)},
+                )
+
+                # Header alone is enough to tell the file drifted
+                drift = processor.check_drift(drifted)[data_path]
+                self.assertEqual(drift["added"], {"c_json": "unknown"})
+                self.assertEqual(drift["removed"], ["c_removed"])
+                self.assertFalse(drift["complete"])
+
+                drift = processor.check_drift(drifted, early_exit=False)[data_path]
+                self.assertEqual(
+                    drift,
+                    dict(
+                        changed={"c_float": dict(baseline="integer", found="float")},
+                        added={"c_json": "json"},
+                        removed=["c_removed"],
+                        complete=True,
+                    ),
+                )
+
+    def test_check_own_drift(self):
+        print("[TEST] Running test_check_own_drift...")
+
+        engines = ["python"]
+        try:
+            import pyarrow  # noqa: F401
+
+            engines.append("arrow")
+        except ImportError:
+            pass
+
+        # Types a column goes through on the way to its own don't drift
+        rows = [
+            ["c_boolean", "c_date"],
+            ["1", "2020-01-01T10:00:00"],
+            ["true", "2020-01-01"],
+            ["0", ""],
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, "own.csv")
+            with open(data_path, "wt", newline="") as f:
+                csv.writer(f).writerows(rows)
+
+            for engine in engines:
+                with self.subTest(engine=engine):
+                    processor = Processor(data_path, "csv", engine=engine)
+                    (schema,) = processor.run()
+                    self.assertEqual(schema, {"c_boolean": "boolean", "c_date": "date"})
+                    self.assertEqual(
+                        processor.check_drift(schema),
+                        {
+                            data_path: dict(
+                                changed={}, added={}, removed=[], complete=True
+                            )
+                        },
+                    )
+
+    def test_columns(self):
+        print("[TEST] Running test_columns...")
+
+        engines = ["python"]
+        try:
+            import pyarrow  # noqa: F401
+
+            engines.append("arrow")
+        except ImportError:
+            pass
+
+        # Names and indexes, in file order whatever the order asked for
+        data_path = os.path.join(self.data_path, "valid_file.csv")
+        columns = ["c_json", 2, "c_missing", 100]
+        for engine in engines:
+            with self.subTest(engine=engine):
+                processor = Processor(data_path, "csv", columns=columns, engine=engine)
+                self.assertEqual(
+                    processor.run(), [{"c_float": "float", "c_json": "json"}]
+                )
+
+                # Columns that are not selected don't drift
+                drift = processor.check_drift(
+                    {"c_float": "integer", "c_string": "json"}, early_exit=False
+                )
+                self.assertEqual(
+                    drift[data_path]["changed"],
+                    {"c_float": dict(baseline="integer", found="float")},
+                )
+                self.assertEqual(drift[data_path]["added"], {"c_json": "json"})
+
+                processor = Processor(data_path, "csv", columns=[], engine=engine)
+                self.assertEqual(processor.run(), [{}])
+
+        # Selected columns of every file match the full scan, as well as
+        # malformed rows (which are found while splitting only selected ones)
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            for options in (
+                dict(max_malformed_rows=None),
+                dict(sniff_dialect=True, header=False, max_malformed_rows=None),
+            ):
+                with self.subTest(file_name=file_name, **options):
+                    processor = Processor(data_path, "csv", **options)
+                    schema = processor.run()[0]
+                    metrics = processor.metrics
+                    names = list(schema)
+                    if not names:
+                        continue
+
+                    processor = Processor(
+                        data_path, "csv", columns=[0, names[-1]], **options
+                    )
+                    self.assertEqual(
+                        processor.run(),
+                        [{names[0]: schema[names[0]], names[-1]: schema[names[-1]]}],
+                    )
+                    self.assertEqual(processor.metrics, metrics)
+
+    def test_prefetch(self):
+        print("[TEST] Running test_prefetch...")
+
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            for options in ({}, dict(sniff_dialect=True)):
+                with self.subTest(file_name=file_name, **options):
+                    expected = Processor(data_path, "csv", **options).run()
+
+                    # Tiny blocks, so that rows span multiple blocks
+                    processor = Processor(
+                        data_path,
+                        "csv",
+                        prefetch=True,
+                        prefetch_block_size=7,
+                        prefetch_depth=2,
+                        **options,
+                    )
+                    self.assertEqual(processor.run(), expected)
+                    for metrics in processor.metrics["files"].values():
+                        self.assertGreaterEqual(metrics["io_wait"], 0)
+
+                    self.assertEqual(
+                        processor.run_chunks(workers=3, min_chunk_size=8), expected
+                    )
+
+    def test_group_by(self):
+        data_path = os.path.join(self.script_path, "data", "partitioned")
+        file_names = [
+            os.path.join(data_path, "table=a", "date=2022-01-01", "part-0.csv"),
+            os.path.join(data_path, "table=a", "date=2022-01-01", "part-1.csv"),
+            os.path.join(data_path, "table=a", "date=2022-01-02", "part-0.csv"),
+            os.path.join(data_path, "table=b", "date=2022-01-01", "part-0.csv"),
+        ]
+        expected_files = {
+            file_names[0]: {"id": "integer", "value": "integer"},
+            file_names[1]: {"id": "integer", "value": "float"},
+            file_names[2]: {"id": "integer", "value": "string", "note": "string"},
+            file_names[3]: {"name": "string", "created": "timestamp"},
+        }
+
+        print("[TEST] Running test_group_by...")
+
+        self.assertEqual(Processor(data_path, "csv").file_list, set())
+        processor = Processor(data_path, "csv", recursive=True)
+        self.assertEqual(processor.file_list, set(file_names))
+        self.assertEqual(processor.run(), list(expected_files.values()))
+
+        processor = Processor(data_path, "csv", recursive=True, group_by=1)
+        expected = dict(
+            groups={
+                "table=a": {"id": "integer", "value": "string", "note": "string"},
+                "table=b": {"name": "string", "created": "timestamp"},
+            },
+            files=expected_files,
+        )
+        self.assertEqual(processor.run(), expected)
+        self.assertEqual(processor.run_workers(workers=2), expected)
+        self.assertEqual(processor.run_threads(workers=2), expected)
+        self.assertEqual(processor.run_chunks(workers=2), expected)
+
+        processor = Processor(data_path, "csv", recursive=True, group_by=2)
+        self.assertEqual(
+            list(processor.run()["groups"]),
+            [
+                os.path.join("table=a", "date=2022-01-01"),
+                os.path.join("table=a", "date=2022-01-02"),
+                os.path.join("table=b", "date=2022-01-01"),
+            ],
+        )
+
+        processor = Processor(
+            data_path, "csv", recursive=True, group_by=r"date=([0-9-]+)"
+        )
+        self.assertEqual(
+            processor.run()["groups"],
+            {
+                "2022-01-01": {
+                    "id": "integer",
+                    "value": "float",
+                    "name": "string",
+                    "created": "timestamp",
+                },
+                "2022-01-02": {"id": "integer", "value": "string", "note": "string"},
+            },
+        )
+
+    def test_outliers(self):
+        data_path = os.path.join(self.data_path, "outliers.csv")
+
+        print("[TEST] Running test_outliers...")
+
+        processor = Processor(data_path, "csv")
+        self.assertEqual(set(processor.run()[0].values()), {"string"})
+
+        processor = Processor(data_path, "csv", outlier_threshold=0.1)
+        self.assertEqual(
+            processor.run(),
+            [
+                {
+                    "c_integer": "string",
+                    "c_float": "float",
+                    "c_date": "date",
+                    "c_boolean": "boolean",
+                    "c_string": "string",
+                }
+            ],
+        )
+        outliers = processor.metrics["files"][data_path]["outliers"]
+        self.assertEqual(list(outliers), ["c_float", "c_date", "c_boolean"])
+        self.assertEqual(
+            outliers["c_boolean"],
+            dict(
+                type="boolean",
+                count=1,
+                counts={"boolean": 7, "integer": 2, "string": 1},
+                sample=[dict(position=8, value="maybe")],
+            ),
+        )
+
+        processor = Processor(data_path, "csv", outlier_threshold=0.2)
+        self.assertEqual(processor.run()[0]["c_integer"], "integer")
+        self.assertEqual(
+            processor.metrics["files"][data_path]["outliers"]["c_integer"]["sample"],
+            [dict(position=6, value="N/A-ish")],
+        )
+
+        # Files too small to split are scanned whole, tolerating outliers too
+        expected = Processor(data_path, "csv", outlier_threshold=0.1).run()
+        processor = Processor(data_path, "csv", outlier_threshold=0.1)
+        self.assertEqual(processor.run_chunks(2), expected)
+        outliers = processor.metrics["files"][data_path]["outliers"]
+        self.assertEqual(list(outliers), ["c_float", "c_date", "c_boolean"])
+
+        # Without outliers, types are the same as in a regular scan
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            with self.subTest(file_name=file_name):
+                expected = Processor(data_path, "csv").run()
+                processor = Processor(data_path, "csv", outlier_threshold=0)
+                self.assertEqual(processor.run(), expected)
+
+    def test_numeric_blocks(self):
+        print("[TEST] Running test_numeric_blocks...")
+
+        # Columns start as numbers and get values that may or may not fit
+        # later on, blocks of rows have to agree with values one by one
+        tails = ["", "NULL", "null", "1.0", "1.5", "-1", "1e5", "٣", "²", "1\n2", "x"]
+        rows = [[str(idx), f"{idx}.5"] * len(tails) for idx in range(3000)]
+        for idx, tail in enumerate(tails):
+            rows[2500 + idx][2 * idx] = tail
+            rows[2500 + idx][2 * idx + 1] = tail
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, "numbers.csv")
+            with open(data_path, "wt", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow([f"c_{idx}" for idx in range(len(rows[0]))])
+                writer.writerows(rows)
+
+            for options in (
+                {},
+                dict(nulls=["NULL"]),
+                dict(nulls=["Null"], case_sensitive=False),
+            ):
+                with self.subTest(**options):
+                    scanner = CSVScanner(iter([]), **options)
+                    expected = ["unknown"] * len(rows[0])
+                    for row in rows:
+                        for idx, value in enumerate(row):
+                            expected[idx] = scanner._get_dtype(value, expected[idx])
+
+                    (schema,) = Processor(data_path, "csv", **options).run()
+                    self.assertEqual(list(schema.values()), expected)
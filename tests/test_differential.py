@@ -0,0 +1,267 @@
+import os
+import csv
+import json
+import random
+import tempfile
+import unittest
+from typing import Dict, Callable
+
+from data_scanner import Processor
+from data_scanner.loader import JSONReader
+from data_scanner.negotiator import Negotiator
+from data_scanner.scanner import CSVScanner, JSONScanner
+
+try:
+    import pyarrow  # noqa: F401
+
+    ARROW_INSTALLED = True
+except ImportError:
+    ARROW_INSTALLED = False
+
+# Values every column can get once in a while
+TRICKY_VALUES = [
+    # Numbers
+    "0",
+    "1",
+    "00012",
+    "-3",
+    "+3",
+    "1.0",
+    "1.",
+    ".5",
+    "-0.0",
+    "1e10",
+    "1E-5",
+    "nan",
+    "inf",
+    "1_000",
+    " 1",
+    "0x10",
+    "١٢",
+    "²",
+    # Booleans
+    "true",
+    "False",
+    "t",
+    "T",
+    "yes",
+    # Dates and timestamps
+    "2022-01-01",
+    "2022-01-01T00:00:00",
+    "2022-01-01 10:00:00",
+    "2022-01-01T10:00:00+02:00",
+    "2022-02-30",
+    "2022-13-01",
+    "20220101",
+    "0000-01-01",
+    "2022-01-01T10:00:60",
+    "now",
+    # Nulls
+    "",
+    "NULL",
+    "None",
+    "NA",
+    "N/A",
+    "null",
+    # Json
+    "{}",
+    "[]",
+    '{"a": 1}',
+    "[1, 2",
+    "{bad}",
+    # Strings
+    "x",
+    "a,b",
+    'a "quoted" value',
+    "two\nlines",
+]
+
+# Values columns mostly have
+VALUE_KINDS = [
+    lambda rng: str(rng.randint(-1000, 1000)),
+    lambda rng: str(rng.randint(0, 10**6)),
+    lambda rng: repr(rng.uniform(-1e3, 1e3)),
+    lambda rng: f"{rng.uniform(0, 100):.2f}",
+    lambda rng: rng.choice(["0", "1"]),
+    lambda rng: rng.choice(["true", "false", "True", "False"]),
+    lambda rng: f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    lambda rng: (
+        f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        f"{rng.choice(['T', ' '])}{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+    ),
+    lambda rng: json.dumps({"a": rng.randint(0, 9), "b": [1, 2]}),
+    lambda rng: rng.choice(["", "NULL"]),
+    lambda rng: rng.choice(["abc", "def", "ghi"]),
+]
+
+
+def generate_csv(file_path: str, seed: int, n_rows: int, n_columns: int) -> None:
+    """Write a random CSV file, columns mostly have values of a single kind."""
+    rng = random.Random(seed)
+    columns = [
+        (rng.choice(VALUE_KINDS), rng.choice([0, 0, 0.0005, 0.01, 0.1]))
+        for _ in range(n_columns)
+    ]
+    with open(file_path, "wt", newline="") as f:
+        writer = csv.writer(f, lineterminator=rng.choice(["\n", "\r\n"]))
+        writer.writerow([f"c_{idx}" for idx in range(n_columns)])
+        for _ in range(n_rows):
+            writer.writerow(
+                [
+                    rng.choice(TRICKY_VALUES) if rng.random() < tricky else kind(rng)
+                    for kind, tricky in columns
+                ]
+            )
+
+
+def _generate_json_value(rng: random.Random, kind: int, tricky: float, depth: int = 0):
+    if rng.random() < tricky:
+        return rng.choice(
+            [None, True, False, 0, 1, -1.5, 1.0, 1e300, [], {}, [1, {"a": 1}]]
+            + TRICKY_VALUES
+        )
+    if kind == 0:
+        return rng.randint(-1000, 1000)
+    if kind == 1:
+        return rng.uniform(-1e3, 1e3)
+    if kind == 2:
+        return rng.choice([True, False])
+    if kind == 3:
+        return f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if kind == 4:
+        return None
+    if kind == 5:
+        return rng.choice(["abc", "def", "1", "0"])
+    if kind == 6:
+        return [rng.randint(0, 9) for _ in range(rng.randint(0, 3))]
+    if kind == 7 and depth < 3:
+        return {
+            key: _generate_json_value(rng, (kind + idx) % 8, tricky, depth + 1)
+            for idx, key in enumerate(["x", "y"][: rng.randint(0, 2)])
+        }
+    return rng.choice(["", "NULL", "x"])
+
+
+def generate_json(file_path: str, seed: int, n_records: int, n_keys: int) -> None:
+    """Write a random JSON file, keys are often missing and values nested."""
+    rng = random.Random(seed)
+    keys = [
+        (f"k_{idx}", rng.randrange(8), rng.choice([0, 0.01, 0.1]))
+        for idx in range(n_keys)
+    ]
+    records = [
+        {
+            key: _generate_json_value(rng, kind, tricky)
+            for key, kind, tricky in keys
+            if rng.random() < 0.9
+        }
+        for _ in range(n_records)
+    ]
+    with open(file_path, "wt") as f:
+        json.dump(records if rng.random() < 0.9 else records[0], f, indent=1)
+
+
+def reference_csv_schema(file_path: str) -> Dict[str, str]:
+    """Resolve CSV values one by one, in file order."""
+    scanner = CSVScanner(iter(()))
+    with open(file_path, "rt") as f:
+        reader = csv.reader(f)
+        head = next(reader)
+        types = ["unknown"] * len(head)
+        for row in reader:
+            for idx, value in enumerate(row):
+                types[idx] = scanner._get_dtype(value, types[idx])
+    return dict(zip(head, types))
+
+
+def reference_json_schema(file_path: str) -> Dict[str, str]:
+    """Resolve JSON values one by one, in file order."""
+    scanner = JSONScanner(iter(()))
+    types = {}
+    with open(file_path, "rb") as f:
+        for record in JSONReader(f):
+            for name, value in record.items():
+                types[name] = scanner._get_dtype(value, types.get(name, "unknown"))
+    return types
+
+
+def get_runs(type_: str, path: str, block_size: int = 64) -> Dict[str, Callable]:
+    """Get every way of scanning files of a type, by name.
+
+    All the files fall into a single group, so every run returns
+    schemas by file path along with a negotiated one. Files are read
+    and split in blocks of about block_size bytes, small blocks make
+    sure values on their edges are tested.
+    """
+
+    def processor(**options):
+        return Processor(path, type_, group_by="^", **options)
+
+    runs = dict(
+        sequential=lambda: processor().run(),
+        prefetch=lambda: processor(prefetch=True, prefetch_block_size=block_size).run(),
+        workers_1=lambda: processor().run_workers(workers=1),
+        workers_2=lambda: processor().run_workers(workers=2),
+        threads_2=lambda: processor().run_threads(workers=2),
+        auto=lambda: processor().run_auto(),
+    )
+    if type_ == "csv":
+        runs.update(
+            chunks_2=lambda: processor().run_chunks(
+                workers=2, min_chunk_size=4 * block_size
+            ),
+            chunks_5=lambda: processor().run_chunks(
+                workers=5, min_chunk_size=block_size
+            ),
+        )
+        if ARROW_INSTALLED:
+            runs.update(
+                arrow=lambda: processor(engine="arrow").run(),
+                arrow_threads_2=lambda: processor(engine="arrow").run_threads(2),
+                # Values are read as binary and decoded where checked one by one
+                arrow_binary=lambda: processor(
+                    engine="arrow", encoding_errors="fallback"
+                ).run(),
+            )
+    else:
+        runs.update(
+            streaming=lambda: processor(engine="streaming").run(),
+            streaming_workers_2=lambda: processor(engine="streaming").run_workers(2),
+        )
+    return runs
+
+
+def generate_files(type_: str, path: str, n_files: int, size: int) -> Dict:
+    """Generate random files, return their schemas resolved one value at a time."""
+    files = {}
+    for seed in range(n_files):
+        file_path = os.path.join(path, f"{seed}.{type_}")
+        if type_ == "csv":
+            generate_csv(file_path, seed, n_rows=size, n_columns=12)
+            files[file_path] = reference_csv_schema(file_path)
+        else:
+            generate_json(file_path, seed, n_records=size, n_keys=8)
+            files[file_path] = reference_json_schema(file_path)
+    return dict(
+        groups={"": Negotiator.negotiate(files.values())},
+        files=dict(sorted(files.items())),
+    )
+
+
+class TestDifferential(unittest.TestCase):
+    def _check_runs(self, type_: str, size: int) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            expected = generate_files(type_, tmp_dir, n_files=6, size=size)
+            for name, run in get_runs(type_, tmp_dir).items():
+                with self.subTest(run=name):
+                    self.assertEqual(run(), expected)
+
+    def test_csv_runs(self):
+        print("[TEST] Running test_csv_runs...")
+
+        self._check_runs("csv", size=400)
+
+    def test_json_runs(self):
+        print("[TEST] Running test_json_runs...")
+
+        self._check_runs("json", size=100)
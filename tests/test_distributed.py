@@ -0,0 +1,92 @@
+import os
+import socket
+import unittest
+import multiprocessing as mp
+
+from data_scanner import Processor
+from data_scanner.distributed import (
+    Coordinator,
+    Worker,
+    send_message,
+    receive_message,
+)
+
+
+class TestDistributed(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.script_path = os.path.dirname(os.path.abspath(__file__))
+        cls.data_path = os.path.join(cls.script_path, "data")
+
+    def _file_list(self, type_):
+        data_path = os.path.join(self.data_path, type_)
+        return sorted(
+            os.path.join(data_path, file_name) for file_name in os.listdir(data_path)
+        )
+
+    def _run(self, coordinator, n_workers):
+        if coordinator._server is None:
+            coordinator.start()
+        host, port = coordinator.address
+        workers = [mp.Process(target=Worker(host, port).run) for _ in range(n_workers)]
+        for process in workers:
+            process.start()
+        try:
+            return coordinator.wait(timeout=60)
+        finally:
+            coordinator.stop()
+            for process in workers:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+    def test_workers_on_localhost(self):
+        print("[TEST] Running test_workers_on_localhost...")
+
+        for type_ in ("csv", "json"):
+            file_list = self._file_list(type_)
+            expected = {
+                file_name: Processor(file_name, type_).run()[0]
+                for file_name in file_list
+            }
+
+            coordinator = Coordinator(
+                file_list, type_, host="127.0.0.1", poll_delay=0.05
+            )
+            self.assertEqual(self._run(coordinator, 2), expected)
+
+    def test_retry_on_worker_loss(self):
+        print("[TEST] Running test_retry_on_worker_loss...")
+
+        file_list = self._file_list("csv")
+        expected = {
+            file_name: Processor(file_name, "csv").run()[0] for file_name in file_list
+        }
+
+        coordinator = Coordinator(file_list, "csv", host="127.0.0.1", poll_delay=0.05)
+        coordinator.start()
+
+        # Worker that takes a task and dies before answering
+        with socket.create_connection(coordinator.address) as connection:
+            send_message(connection, dict(type="ready"))
+            lost_task = receive_message(connection)
+        self.assertEqual(lost_task["type"], "task")
+
+        self.assertEqual(self._run(coordinator, 1), expected)
+
+    def test_give_up_after_retries(self):
+        print("[TEST] Running test_give_up_after_retries...")
+
+        file_name = self._file_list("csv")[-1]
+        coordinator = Coordinator(
+            [file_name], "csv", host="127.0.0.1", max_retries=1, poll_delay=0.05
+        )
+        coordinator.start()
+        try:
+            for _ in range(2):
+                with socket.create_connection(coordinator.address) as connection:
+                    send_message(connection, dict(type="ready"))
+                    self.assertEqual(receive_message(connection)["type"], "task")
+            self.assertEqual(coordinator.wait(timeout=10), {file_name: {}})
+        finally:
+            coordinator.stop()
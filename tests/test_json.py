@@ -1,5 +1,9 @@
 import os
+import json
+import tempfile
+import tracemalloc
 import unittest
+from unittest import mock
 
 from data_scanner import Processor
 
@@ -175,3 +179,250 @@ class TestJSONProcessor(unittest.TestCase):
         processor = Processor(data_path, "json")
         schemas = processor.run_workers()
         self.assertEqual(schemas, expected_schemas)
+
+    def test_streaming_engine(self):
+        print("[TEST] Running test_streaming_engine...")
+
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            with self.subTest(file_name=file_name):
+                expected = Processor(data_path, "json").run()
+                schemas = Processor(data_path, "json", engine="streaming").run()
+                self.assertEqual(schemas, expected)
+
+    def test_streaming_limits(self):
+        data_path = os.path.join(self.data_path, "nested_records.json")
+
+        print("[TEST] Running test_streaming_limits...")
+
+        processor = Processor(data_path, "json", engine="streaming", max_depth=1)
+        self.assertEqual(
+            processor.run(),
+            [
+                {
+                    "id": "integer",
+                    "user_name": "string",
+                    "user_address": "json",
+                    "tags": "json",
+                    "extra": "float",
+                }
+            ],
+        )
+
+        processor = Processor(data_path, "json", engine="streaming", max_keys=3)
+        self.assertEqual(
+            processor.run(),
+            [{"id": "integer", "user_name": "string", "user_address_city": "string"}],
+        )
+        self.assertEqual(processor.metrics["files"][data_path]["skipped_values"], 6)
+
+    def test_streaming_max_keys_memory(self):
+        print("[TEST] Running test_streaming_max_keys_memory...")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, "wide.json")
+            with open(data_path, "wt") as f:
+                json.dump(
+                    [{f"k_{idx}": {"a": idx, "b": "x"} for idx in range(50000)}], f
+                )
+
+            peaks = {}
+            for max_keys in (None, 10):
+                processor = Processor(
+                    data_path, "json", engine="streaming", max_keys=max_keys
+                )
+                tracemalloc.start()
+                (schema,) = processor.run()
+                peaks[max_keys] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            # Names over the limit are not kept
+            self.assertEqual(len(schema), 10)
+            self.assertEqual(
+                processor.metrics["files"][data_path]["skipped_values"], 99990
+            )
+            self.assertLess(peaks[10], peaks[None] / 4)
+
+    def test_columns(self):
+        data_path = os.path.join(self.data_path, "nested_records.json")
+
+        print("[TEST] Running test_columns...")
+
+        for engine in ("python", "streaming"):
+            with self.subTest(engine=engine):
+                processor = Processor(
+                    data_path,
+                    "json",
+                    engine=engine,
+                    columns=["id", "user_address", "missing"],
+                )
+                self.assertEqual(
+                    processor.run(),
+                    [
+                        {
+                            "id": "integer",
+                            "user_address_city": "string",
+                            "user_address_zip": "string",
+                            "user_address": "unknown",
+                        }
+                    ],
+                )
+
+                # Prefix selects whole key path segments only
+                processor = Processor(
+                    data_path, "json", engine=engine, columns=["user_n", "ext"]
+                )
+                self.assertEqual(processor.run(), [{}])
+
+                # Keys that are not selected don't drift
+                processor = Processor(data_path, "json", engine=engine, columns=["id"])
+                drift = processor.check_drift({"id": "integer", "tags": "string"})
+                self.assertEqual(
+                    drift[data_path],
+                    dict(changed={}, added={}, removed=[], complete=True),
+                )
+
+    def test_memory_limit(self):
+        print("[TEST] Running test_memory_limit...")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Single object is loaded whole by python engine
+            data_path = os.path.join(tmp_dir, "big_object.json")
+            with open(data_path, "wt") as f:
+                json.dump({f"k_{idx}": {"a": idx} for idx in range(100000)}, f)
+            small_path = os.path.join(self.data_path, "valid_json_list.json")
+            paths = [data_path, small_path]
+            # Grouped results hold schemas by file path
+            expected = Processor(paths, "json", group_by="^").run()
+
+            processor = Processor(paths, "json", group_by="^", memory_limit=1024**4)
+            self.assertEqual(processor.run_workers(workers=2), expected)
+            self.assertGreater(processor.metrics["peak_memory"], 0)
+
+            # First worker to scan the big file is over the limit
+            pids = []
+
+            def get_rss(pid):
+                if not pids:
+                    pids.append(pid)
+                return 2 * 1024**4 if pid == pids[0] else 1
+
+            with mock.patch("data_scanner.processor.get_rss", get_rss):
+                processor = Processor(data_path, "json", memory_limit=1024**4)
+                self.assertEqual(
+                    processor.run_workers(workers=1), [expected["files"][data_path]]
+                )
+            self.assertTrue(processor.metrics["files"][data_path]["retried"])
+
+    def test_task_timeout(self):
+        print("[TEST] Running test_task_timeout...")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, "big_object.json")
+            with open(data_path, "wt") as f:
+                json.dump({f"k_{idx}": {"a": idx} for idx in range(100000)}, f)
+            small_path = os.path.join(self.data_path, "valid_json_list.json")
+            paths = [data_path, small_path]
+            quarantine = os.path.join(tmp_dir, "quarantine.txt")
+            expected = Processor(paths, "json", group_by="^").run()
+
+            processor = Processor(paths, "json", group_by="^", quarantine=quarantine)
+            schemas = processor.run_workers(workers=2, max_retries=1, task_timeout=0.01)
+            self.assertEqual(schemas["files"][data_path], {})
+            self.assertEqual(
+                schemas["files"][small_path], expected["files"][small_path]
+            )
+            self.assertEqual(processor.metrics["quarantined"], [data_path])
+            self.assertNotIn(data_path, processor.metrics["files"])
+
+            # Quarantined files are skipped by later scans
+            processor = Processor(paths, "json", quarantine=quarantine)
+            self.assertEqual(processor.file_list, {small_path})
+
+    def test_ijson_backend(self):
+        print("[TEST] Running test_ijson_backend...")
+
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            with self.subTest(file_name=file_name):
+                expected = Processor(data_path, "json").run()
+                for engine in ("python", "streaming"):
+                    processor = Processor(
+                        data_path, "json", engine=engine, ijson_backend="python"
+                    )
+                    self.assertEqual(processor.run(), expected)
+                    for metrics in processor.metrics["files"].values():
+                        self.assertEqual(metrics["backend"], "python")
+
+        with self.assertRaises(ImportError):
+            Processor(self.data_path, "json", ijson_backend="missing")
+
+    def test_check_drift(self):
+        data_path = os.path.join(self.data_path, "nested_records.json")
+
+        print("[TEST] Running test_check_drift...")
+
+        for engine in ("python", "streaming"):
+            with self.subTest(engine=engine):
+                (baseline,) = Processor(data_path, "json", engine=engine).run()
+
+                processor = Processor(data_path, "json", engine=engine)
+                drift = processor.check_drift(baseline)
+                self.assertEqual(
+                    drift,
+                    {data_path: dict(changed={}, added={}, removed=[], complete=True)},
+                )
+
+                # Integers can't become dates, scan stops right away
+                drift = processor.check_drift({**baseline, "id": "date"})
+                self.assertEqual(list(drift[data_path]["changed"]), ["id"])
+                self.assertFalse(drift[data_path]["complete"])
+
+                # But they could still become booleans, until the end of file
+                drift = processor.check_drift({**baseline, "id": "boolean"})
+                self.assertEqual(
+                    drift[data_path]["changed"],
+                    {"id": dict(baseline="boolean", found="integer")},
+                )
+                self.assertTrue(drift[data_path]["complete"])
+
+    def test_prefetch(self):
+        print("[TEST] Running test_prefetch...")
+
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            with self.subTest(file_name=file_name):
+                expected = Processor(data_path, "json").run()
+                for engine in ("python", "streaming"):
+                    processor = Processor(
+                        data_path,
+                        "json",
+                        engine=engine,
+                        prefetch=True,
+                        prefetch_block_size=5,
+                        prefetch_depth=2,
+                    )
+                    self.assertEqual(processor.run(), expected)
+
+    def test_outliers(self):
+        data_path = os.path.join(self.data_path, "outliers.json")
+
+        print("[TEST] Running test_outliers...")
+
+        processor = Processor(data_path, "json", outlier_threshold=0.25)
+        self.assertEqual(
+            processor.run(), [{"c_integer": "integer", "c_float": "float"}]
+        )
+        outliers = processor.metrics["files"][data_path]["outliers"]
+        self.assertEqual(outliers["c_integer"]["sample"], [dict(position=3, value="3")])
+        self.assertEqual(outliers["c_float"]["counts"], {"float": 4, "string": 1})
+
+        with self.assertRaises(AssertionError):
+            Processor(data_path, "json", engine="streaming", outlier_threshold=0.25)
+
+        for file_name in sorted(os.listdir(self.data_path)):
+            data_path = os.path.join(self.data_path, file_name)
+            with self.subTest(file_name=file_name):
+                expected = Processor(data_path, "json").run()
+                processor = Processor(data_path, "json", outlier_threshold=0)
+                self.assertEqual(processor.run(), expected)
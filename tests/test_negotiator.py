@@ -1,7 +1,7 @@
 import os
 import unittest
 
-from data_scanner.negotiator import Negotiator
+from data_scanner.negotiator import Negotiator, DriftDetector
 
 
 class TestNegotiator(unittest.TestCase):
@@ -217,3 +217,56 @@ class TestNegotiator(unittest.TestCase):
         result = Negotiator.negotiate(schemas)
 
         self.assertEqual(result, expected)
+
+    def test_allowed_types(self):
+        self.assertEqual(Negotiator.get_allowed_types("date"), {"unknown", "date"})
+        self.assertEqual(
+            Negotiator.get_allowed_types("timestamp"),
+            {"unknown", "date", "timestamp"},
+        )
+        self.assertEqual(len(Negotiator.get_allowed_types("string")), 8)
+
+    def test_drift_detector(self):
+        baseline = {"a": "integer", "b": "date", "c": "string", "d": "float"}
+
+        detector = DriftDetector(baseline)
+        self.assertFalse(detector.set_columns(["a", "b", "c", "d"]))
+        self.assertFalse(detector.update("a", "integer"))
+        self.assertFalse(detector.update("c", "json"))
+        self.assertFalse(detector.can_drift("c"))
+        self.assertEqual(
+            detector.report(),
+            dict(changed={}, added={}, removed=[], complete=True),
+        )
+
+        # Date column can go through a timestamp, only its final type counts
+        detector = DriftDetector(baseline)
+        self.assertFalse(detector.update("b", "date"))
+        self.assertFalse(detector.update("b", "timestamp"))
+        self.assertFalse(detector.update("b", "date"))
+        self.assertEqual(detector.report()["changed"], {})
+        self.assertFalse(detector.update("b", "timestamp"))
+        self.assertEqual(
+            detector.report()["changed"],
+            {"b": dict(baseline="date", found="timestamp")},
+        )
+
+        # Integer column can still end as a float, but not as a json
+        detector = DriftDetector(baseline)
+        self.assertFalse(detector.update("d", "integer"))
+        self.assertTrue(detector.update("a", "json"))
+        self.assertTrue(detector.update("e", "boolean"))
+        self.assertEqual(
+            detector.report(complete=False),
+            dict(
+                changed={"a": dict(baseline="integer", found="json")},
+                added={"e": "boolean"},
+                removed=[],
+                complete=False,
+            ),
+        )
+        self.assertEqual(detector.report()["removed"], ["b", "c"])
+
+        detector = DriftDetector(baseline)
+        self.assertTrue(detector.set_columns(["a", "b", "c"]))
+        self.assertEqual(detector.report(complete=False)["removed"], ["d"])
@@ -0,0 +1,125 @@
+import os
+import csv
+import pickle
+import unittest
+
+from data_scanner.loader import CSVLoader, JSONLoader
+from data_scanner.scanner import CSVScanner, JSONScanner
+from data_scanner.state import TYPES, REACHABLE_TYPES, ColumnState, SchemaState
+
+
+class TestSchemaState(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.script_path = os.path.dirname(os.path.abspath(__file__))
+        cls.data_path = os.path.join(cls.script_path, "data")
+
+    @staticmethod
+    def _chunks(rows, size):
+        return [rows[idx : idx + size] for idx in range(0, len(rows), size)]
+
+    def test_csv_chunks(self):
+        print("[TEST] Running test_csv_chunks...")
+
+        file_path = os.path.join(self.data_path, "csv", "valid_file.csv")
+        with CSVLoader(file_path) as loader:
+            expected_schema = CSVScanner(loader).get_schema()
+        with open(file_path, "rt") as f:
+            head, *rows = list(csv.reader(f))
+
+        for size in range(1, len(rows) + 1):
+            states = [
+                CSVScanner(iter([head, *chunk])).get_state()
+                for chunk in self._chunks(rows, size)
+            ]
+            self.assertEqual(
+                SchemaState.merge_all(states).get_schema(), expected_schema
+            )
+
+    def test_json_chunks(self):
+        print("[TEST] Running test_json_chunks...")
+
+        file_path = os.path.join(self.data_path, "json", "valid_json_list.json")
+        with JSONLoader(file_path) as loader:
+            expected_schema = JSONScanner(loader).get_schema()
+        with JSONLoader(file_path) as loader:
+            rows = list(loader)
+
+        for size in range(1, len(rows) + 1):
+            states = [
+                JSONScanner(iter(chunk)).get_state()
+                for chunk in self._chunks(rows, size)
+            ]
+            schema = SchemaState.merge_all(states).get_schema()
+            self.assertEqual(schema, expected_schema)
+            self.assertEqual(list(schema), list(expected_schema))
+
+    def test_order_dependent_values(self):
+        # Sequential scan is order dependent (integer column widened
+        # by a boolean, timestamp narrowed back to date), merged
+        # states have to follow it exactly
+        print("[TEST] Running test_order_dependent_values...")
+
+        values = ["1", "", "2", "true", "NULL", "2022-01-01T10:00:00", "2022-01-01"]
+        rows = [["column"]] + [[value] for value in values]
+
+        for split in range(1, len(rows)):
+            expected = CSVScanner(iter(rows)).get_schema()
+            left = CSVScanner(iter(rows[:split])).get_state()
+            right = CSVScanner(iter([rows[0]] + rows[split:])).get_state()
+            self.assertEqual(left.merge(right).get_schema(), expected)
+
+    def test_reachable_types(self):
+        # Drift detection relies on types a column can end with
+        print("[TEST] Running test_reachable_types...")
+
+        csv_values = [
+            "1",
+            "-1.5",
+            "1e5",
+            "true",
+            "0",
+            "2022-01-01",
+            "2022-01-01T10:00:00",
+        ]
+        csv_values += ["[1]", '{"a": 1}', "x", "", "NULL"]
+        json_values = [1, 1.5, True, "true", "2022-01-01", "2022-01-01T10:00:00"]
+        json_values += [[1], {"a": 1}, "x", None]
+        states = [
+            CSVScanner(iter([["column"], [value]])).get_state().columns["column"]
+            for value in csv_values
+        ] + [
+            JSONScanner(iter([{"column": value}])).get_state().columns["column"]
+            for value in json_values
+        ]
+
+        for state in states:
+            for start, end in zip(TYPES, state.transitions):
+                self.assertIn(end, REACHABLE_TYPES[start])
+        # Types reachable on the way are reachable right away
+        for type_, reachable in REACHABLE_TYPES.items():
+            self.assertIn(type_, reachable)
+            for other in reachable:
+                self.assertLessEqual(REACHABLE_TYPES[other], reachable)
+
+    def test_associativity(self):
+        print("[TEST] Running test_associativity...")
+
+        rows = [["a", "b"], ["1", "x"], ["1.5", ""], ["true", "{}"], ["", "[]"]]
+        a, b, c = (CSVScanner(iter([rows[0], row])).get_state() for row in rows[1:4])
+        self.assertEqual(a.merge(b).merge(c), a.merge(b.merge(c)))
+        self.assertEqual(a.merge(SchemaState()), a)
+        self.assertEqual(SchemaState().merge(a), a)
+
+    def test_serialization(self):
+        print("[TEST] Running test_serialization...")
+
+        rows = [["a", "b", "c"], ["1", "", "2022-01-01"], ["0", "", "x"]]
+        state = CSVScanner(iter(rows)).get_state()
+
+        self.assertEqual(SchemaState.from_dict(state.to_dict()), state)
+        self.assertEqual(pickle.loads(pickle.dumps(state)), state)
+        # Column with nulls only keeps every starting type untouched
+        self.assertEqual(state.columns["b"], ColumnState())
+        with self.assertRaises(ValueError):
+            ColumnState(["unknown"])
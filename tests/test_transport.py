@@ -0,0 +1,97 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from data_scanner import Processor
+from data_scanner.processor import scan_file
+from data_scanner.state import TYPES
+from data_scanner.transport import (
+    SchemaEncoder,
+    SchemaDecoder,
+    put_shared,
+    take_shared,
+    unlink_shared,
+)
+
+
+class TestTransport(unittest.TestCase):
+    def test_encode_decode(self):
+        print("[TEST] Running test_encode_decode...")
+
+        schemas = [
+            {},
+            {"a": "integer", "b": "string"},
+            {"b": "json", "c": "unknown", "": "date", "ą_ß": "timestamp"},
+            {name: TYPES[idx % len(TYPES)] for idx, name in enumerate("abcdefgh")},
+            {"a": "float"},
+        ]
+
+        encoder, decoder = SchemaEncoder(), SchemaDecoder()
+        for schema in schemas:
+            encoded = encoder.encode(schema)
+            decoded = decoder.decode(encoded)
+            self.assertEqual(decoded, schema)
+            self.assertEqual(list(decoded), list(schema))
+
+        # Known names are not sent again, header and 5 bytes per column
+        self.assertEqual(len(encoder.encode(schemas[3])), 12 + 5 * 8)
+        self.assertIsNone(encoder.encode({"a\0b": "string"}))
+
+    def test_shared_memory(self):
+        print("[TEST] Running test_shared_memory...")
+
+        payload = SchemaEncoder().encode({"a": "integer"})
+        handle = put_shared(payload)
+        self.assertEqual(take_shared(handle), payload)
+        with self.assertRaises(FileNotFoundError):
+            take_shared(handle)
+
+        # Named blocks can be removed without their handles
+        name = f"ds_test_{os.getpid()}"
+        self.assertEqual(put_shared(payload, name), (name, len(payload)))
+        self.assertTrue(unlink_shared(name))
+        self.assertFalse(unlink_shared(name))
+
+    def test_run_workers(self):
+        print("[TEST] Running test_run_workers...")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for idx in range(4):
+                records = [
+                    {f"key_{key}": [idx, "a", 1.5, None][key % 4] for key in range(500)}
+                ]
+                with open(os.path.join(tmp_dir, f"{idx}.json"), "wt") as f:
+                    json.dump(records, f)
+
+            expected = Processor(tmp_dir, "json", negotiate_schema=True).run()
+            # Every schema passed through shared memory
+            with mock.patch("data_scanner.transport.SHARED_MEMORY_MIN_SIZE", 0):
+                schema = Processor(tmp_dir, "json", negotiate_schema=True).run_workers(
+                    workers=2
+                )
+            self.assertEqual(schema, expected)
+
+    @unittest.skipUnless(os.path.isdir("/dev/shm"), "Shared memory is not listed")
+    def test_lost_worker(self):
+        print("[TEST] Running test_lost_worker...")
+
+        def scan_or_exit(file_name, *args):
+            # Process dies before its last schema is read
+            if file_name.endswith("1.json"):
+                os._exit(1)
+            return scan_file(file_name, *args)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for idx in range(2):
+                with open(os.path.join(tmp_dir, f"{idx}.json"), "wt") as f:
+                    json.dump([{"a": idx}], f)
+
+            blocks = set(os.listdir("/dev/shm"))
+            with mock.patch(
+                "data_scanner.transport.SHARED_MEMORY_MIN_SIZE", 0
+            ), mock.patch("data_scanner.processor.scan_file", scan_or_exit):
+                Processor(tmp_dir, "json").run_workers(workers=1, max_retries=0)
+            # Blocks of the lost worker are removed along with it
+            self.assertEqual(set(os.listdir("/dev/shm")) - blocks, set())